@@ -3,25 +3,38 @@ FastAPI application for CRC segmentation inference.
 Handles image uploads, preprocessing, inference, and postprocessing.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Body
+from fastapi import FastAPI, File, UploadFile, HTTPException, Body, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from typing import List, Dict, Optional
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, FileResponse, StreamingResponse
+from typing import AsyncIterator, BinaryIO, List, Dict, Optional, Sequence, Tuple
+from pydantic import BaseModel, ConfigDict
 import asyncio
+import bisect
+from collections import OrderedDict
 from pathlib import Path
-import base64
 import io
+import os
+import shutil
+import sys
+import time
+import uuid
+import pybase64
+import xxhash
+import orjson
+import numpy as np
+from PIL import Image
 
 from predict import CRCSegmentationModel
+from batcher import InferenceBatcher
 from preprocessing import preprocess_image
-from postprocessing import create_overlay, create_gradcam_overlay, get_mask_statistics
+from postprocessing import create_visualizations, get_mask_statistics
 from report_generator import create_report
 from llm_service import RecommendationService
 from image_validation import validate_image_bytes
 
 # Initialize FastAPI app
-app = FastAPI(title="CRC Segmentation API", version="1.0.0")
+# orjson serializes the large base64 payloads much faster than stdlib json
+app = FastAPI(title="CRC Segmentation API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Enable CORS for frontend integration
 app.add_middleware(
@@ -40,14 +53,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Micro-batching configuration (requests arriving within the timeout share one session.run)
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "8"))
+BATCH_TIMEOUT_MS = float(os.environ.get("BATCH_TIMEOUT_MS", "5"))
+
+# LRU cache of (original image, prediction) keyed by upload content hash, so
+# /generate-report on an image that was just segmented skips preprocess + inference
+INFER_CACHE_SIZE = int(os.environ.get("INFER_CACHE_SIZE", "32"))
+_infer_cache: "OrderedDict[bytes, Tuple[Image.Image, np.ndarray]]" = OrderedDict()
+
+# Background report jobs live on disk (one directory per job) so any worker process can serve the poll.
+# The path is anchored to this file (not the cwd) so every worker agrees on it; jobs older than
+# the TTL are deleted whenever a new one is created.
+REPORT_JOBS_DIR = Path(os.environ.get(
+    "REPORT_JOBS_DIR", Path(__file__).resolve().parent / "outputs" / "reports" / "jobs"
+))
+REPORT_JOB_TTL_HOURS = float(os.environ.get("REPORT_JOB_TTL_HOURS", "24"))
+
 # Initialize model and recommendation service (loaded once at startup)
 model = None
+batcher = None
 recommendation_service = None
 
 @app.on_event("startup")
 async def load_model():
     """Load the ONNX model and recommendation service once at application startup."""
-    global model, recommendation_service
+    global model, batcher, recommendation_service
     try:
         model = CRCSegmentationModel()
         print("✅ CRC Segmentation model loaded successfully")
@@ -55,6 +86,19 @@ async def load_model():
         print(f"❌ Failed to load model: {e}")
         raise
     
+    # Report which base64 kernel is active (SIMD vs. scalar fallback)
+    print(f"✅ pybase64 {pybase64.get_version()}")
+    
+    # Start the inference batcher
+    batcher = InferenceBatcher(model, max_batch_size=BATCH_SIZE, batch_timeout_ms=BATCH_TIMEOUT_MS)
+    batcher.start()
+    print(f"✅ Inference batcher started (max batch: {batcher.max_batch_size}, timeout: {BATCH_TIMEOUT_MS} ms)")
+    
+    # Warm up the session at single-image and full-batch sizes
+    warmup_sizes = sorted({1, batcher.max_batch_size})
+    await asyncio.to_thread(model.warmup, warmup_sizes)
+    print(f"✅ Model warmed up (batch sizes: {warmup_sizes})")
+    
     # Initialize recommendation service (with fallback if API key not available)
     try:
         recommendation_service = RecommendationService()
@@ -64,7 +108,24 @@ async def load_model():
         print("   Falling back to hardcoded recommendations")
         recommendation_service = None
 
-@app.get("/")
+@app.on_event("shutdown")
+async def stop_batcher():
+    """Stop the inference batcher background task and the model's inference thread."""
+    if batcher:
+        await batcher.stop()
+    if model:
+        model.close()
+
+class StatusResponse(BaseModel):
+    status: str
+    message: str
+    model_loaded: bool
+
+class HealthResponse(BaseModel):
+    status: str
+    model_status: str
+
+@app.get("/", response_model=StatusResponse)
 async def root():
     """Health check endpoint."""
     return {
@@ -73,7 +134,7 @@ async def root():
         "model_loaded": model is not None
     }
 
-@app.get("/health")
+@app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Detailed health check."""
     return {
@@ -81,16 +142,170 @@ async def health_check():
         "model_status": "loaded" if model else "not loaded"
     }
 
+def img_to_data_url(img, fmt: str, **save_kwargs) -> str:
+    """
+    Encode a PIL image as a base64 data URL.
+    
+    Args:
+        img: PIL Image
+        fmt: Pillow format name (e.g. "PNG", "JPEG", "WEBP")
+        **save_kwargs: Encoder options passed to Image.save
+        
+    Returns:
+        data:image/<fmt>;base64,... string
+    """
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **save_kwargs)
+    # getbuffer() exposes the BytesIO contents without copying them into a new bytes object
+    encoded = pybase64.b64encode(buffer.getbuffer()).decode("ascii")
+    return f"data:image/{fmt.lower()};base64,{encoded}"
+
+def img_to_bytes(img, fmt: str, **save_kwargs) -> bytes:
+    """
+    Encode a PIL image into an in-memory image file (no base64), for in-process consumers.
+    
+    Args:
+        img: PIL Image
+        fmt: Pillow format name (e.g. "PNG", "JPEG")
+        **save_kwargs: Encoder options passed to Image.save
+        
+    Returns:
+        Encoded image file bytes
+    """
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue()
+
+def _hash_stream(stream: BinaryIO, chunk_size: int = 1 << 20) -> bytes:
+    """
+    Hash an upload in chunks and rewind it, without holding the whole file in memory.
+    
+    Args:
+        stream: Binary file object (UploadFile.file)
+        chunk_size: Bytes read per update
+        
+    Returns:
+        xxh3_64 digest used as the inference cache key
+    """
+    # Non-cryptographic hash is enough for deduplicating uploads
+    hasher = xxhash.xxh3_64()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        hasher.update(chunk)
+    stream.seek(0)
+    return hasher.digest()
+
+async def _run_inference(stream: BinaryIO, key: bytes) -> Tuple[Image.Image, np.ndarray]:
+    """
+    Preprocess an image and run batched inference, memoized by content hash.
+    
+    Args:
+        stream: Binary file object holding the upload
+        key: Content hash from _hash_stream
+        
+    Returns:
+        tuple: (original PIL Image, binary segmentation mask)
+    """
+    cached = _infer_cache.get(key)
+    if cached is not None:
+        _infer_cache.move_to_end(key)
+        return cached
+    
+    # Preprocess image, decoding straight from the spooled upload
+    stream.seek(0)
+    original_img, preprocessed_tensor = await asyncio.to_thread(preprocess_image, stream)
+    
+    # Run inference (batched with other pending requests)
+    prediction = await batcher.submit(preprocessed_tensor)
+    
+    _infer_cache[key] = (original_img, prediction)
+    while len(_infer_cache) > INFER_CACHE_SIZE:
+        _infer_cache.popitem(last=False)
+    
+    return original_img, prediction
+
+def _render_segmentation(filename: str, original_img, prediction) -> dict:
+    """
+    Build overlay, Grad-CAM and statistics for one segmented image (runs in a worker thread).
+    """
+    # Create overlay (binary segmentation mask) and Grad-CAM heatmap in one pass
+    overlay_img, gradcam_img = create_visualizations(original_img, prediction, gradcam_alpha=0.4)
+    
+    # Get mask statistics
+    mask_stats = get_mask_statistics(prediction)
+    
+    # Encode images as data URLs (JPEG/WebP for photographic content, PNG keeps mask edges crisp)
+    original_url = img_to_data_url(original_img, "JPEG", quality=85, optimize=False)
+    overlay_url = img_to_data_url(overlay_img, "PNG", optimize=False, compress_level=1)
+    gradcam_url = img_to_data_url(gradcam_img, "WEBP", quality=80, method=0)
+    
+    return {
+        "filename": filename,
+        "status": "success",
+        "original": original_url,
+        "overlay": overlay_url,
+        "gradcam": gradcam_url,  # Separate Grad-CAM
+        "image_shape": original_img.size,
+        "mask_shape": prediction.shape,
+        "statistics": mask_stats
+    }
+
+async def _segment_file(file: UploadFile) -> dict:
+    """
+    Validate, preprocess, segment and render a single uploaded file.
+    """
+    # Stream from the spooled upload instead of buffering it into a bytes object
+    stream = file.file
+    key = await asyncio.to_thread(_hash_stream, stream)
+    
+    # Validate colonoscopy image
+    is_valid, reason = await asyncio.to_thread(validate_image_bytes, stream)
+    if not is_valid:
+        print("Invalid image, please upload a colonoscopy image")
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "error": "Invalid image, please upload a colonoscopy image"
+        }
+    
+    print(f"✔ Image passed colonoscopy validation: {file.filename}")
+    
+    # Preprocess and run inference (or reuse a cached result for identical bytes)
+    original_img, prediction = await _run_inference(stream, key)
+    
+    return await asyncio.to_thread(_render_segmentation, file.filename, original_img, prediction)
+
+async def _segment_file_safe(file: UploadFile) -> dict:
+    """
+    Run _segment_file, turning any exception into a per-file error result.
+    """
+    try:
+        return await _segment_file(file)
+    except Exception as e:
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "error": str(e)
+        }
+
+async def _process_stream(files: List[UploadFile]) -> AsyncIterator[dict]:
+    """
+    Yield per-file results in completion order rather than upload order.
+    """
+    for next_result in asyncio.as_completed([_segment_file_safe(file) for file in files]):
+        yield await next_result
+
 @app.post("/segment")
-async def segment_images(files: List[UploadFile] = File(...)):
+async def segment_images(files: List[UploadFile] = File(...), stream: bool = False):
     """
     Segments multiple colonoscopy images and returns overlay masks.
     
     Args:
         files: List of uploaded image files
+        stream: Emit one NDJSON line per image as it finishes instead of a single JSON body
         
     Returns:
-        JSON response with base64-encoded overlay images
+        JSON response with base64-encoded overlay images, or an NDJSON stream of results
     """
     if not model:
         raise HTTPException(status_code=503, detail="Model not loaded")
@@ -98,77 +313,17 @@ async def segment_images(files: List[UploadFile] = File(...)):
     if not files or len(files) == 0:
         raise HTTPException(status_code=400, detail="No files uploaded")
     
-    results = []
+    if stream:
+        async def _gen():
+            async for result in _process_stream(files):
+                yield orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+        
+        return StreamingResponse(_gen(), media_type="application/x-ndjson")
     
-    # Process each image
-    for file in files:
-        try:
-            # Read image file
-            image_bytes = await file.read()
-            
-            # Validate colonoscopy image
-            is_valid, reason = validate_image_bytes(image_bytes)
-            if not is_valid:
-                print("Invalid image, please upload a colonoscopy image")
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "error": "Invalid image, please upload a colonoscopy image"
-                })
-                continue
-            
-            print(f"✔ Image passed colonoscopy validation: {file.filename}")
-            
-            # Preprocess image
-            original_img, preprocessed_tensor = preprocess_image(image_bytes)
-            
-            # Run inference
-            prediction = await model.predict(preprocessed_tensor)
-            
-            # Create overlay (binary segmentation mask)
-            overlay_img = create_overlay(original_img, prediction)
-            
-            # Create Grad-CAM heatmap (smooth gradient visualization)
-            gradcam_img = create_gradcam_overlay(original_img, prediction, alpha=0.4)
-            
-            # Get mask statistics
-            mask_stats = get_mask_statistics(prediction)
-            
-            # Convert original image to base64
-            original_buffer = io.BytesIO()
-            original_img.save(original_buffer, format="PNG")
-            original_base64 = base64.b64encode(original_buffer.getvalue()).decode("utf-8")
-            
-            # Convert overlay to base64
-            overlay_buffer = io.BytesIO()
-            overlay_img.save(overlay_buffer, format="PNG")
-            overlay_base64 = base64.b64encode(overlay_buffer.getvalue()).decode("utf-8")
-            
-            # Convert Grad-CAM to base64
-            gradcam_buffer = io.BytesIO()
-            gradcam_img.save(gradcam_buffer, format="PNG")
-            gradcam_base64 = base64.b64encode(gradcam_buffer.getvalue()).decode("utf-8")
-            
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "original": f"data:image/png;base64,{original_base64}",
-                "overlay": f"data:image/png;base64,{overlay_base64}",
-                "gradcam": f"data:image/png;base64,{gradcam_base64}",  # Separate Grad-CAM
-                "mask": f"data:image/png;base64,{overlay_base64}",
-                "image_shape": original_img.size,
-                "mask_shape": prediction.shape,
-                "statistics": mask_stats
-            })
-            
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "status": "error",
-                "error": str(e)
-            })
+    # Process all images concurrently; CPU-bound stages run on the threadpool
+    results = await asyncio.gather(*[_segment_file_safe(file) for file in files])
     
-    return JSONResponse(content={
+    return ORJSONResponse(content={
         "status": "completed",
         "results": results,
         "total_processed": len(results)
@@ -199,14 +354,14 @@ async def validate_image(file: UploadFile = File(...)):
         is_valid, reason = validate_image_bytes(image_bytes)
         
         if is_valid:
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "status": "valid",
                 "message": "Image passed colonoscopy validation",
                 "filename": file.filename
             })
         else:
             print("Invalid image, please upload a colonoscopy image")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={
                     "status": "invalid",
@@ -215,7 +370,7 @@ async def validate_image(file: UploadFile = File(...)):
                 }
             )
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "status": "error",
@@ -225,11 +380,22 @@ async def validate_image(file: UploadFile = File(...)):
         )
 
 class RecommendationRequest(BaseModel):
+    # Strict mode skips the per-field coercion attempts; unknown keys are rejected
+    model_config = ConfigDict(strict=True, extra='forbid')
+    
     risk_level: str
     cancer_percentage: float
     statistics: Optional[Dict] = None
 
-@app.post("/get-recommendations")
+class Recommendation(BaseModel):
+    type: str
+    text: str
+
+class RecommendationResponse(BaseModel):
+    status: str
+    recommendations: List[Recommendation]
+
+@app.post("/get-recommendations", response_model=RecommendationResponse)
 async def get_recommendations_endpoint(request: RecommendationRequest):
     """
     Get AI-generated clinical recommendations based on analysis results.
@@ -246,30 +412,40 @@ async def get_recommendations_endpoint(request: RecommendationRequest):
             request.cancer_percentage, 
             request.statistics
         )
-        return JSONResponse(content={
+        return {
             "status": "success",
             "recommendations": recommendations
-        })
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
+# Coverage thresholds (exclusive lower bounds) and the risk level above each
+_RISK_THRESHOLDS = (0.1, 0.5, 2.0)
+_RISK_LABELS = ('Safe', 'Low Risk', 'Medium Risk', 'High Risk')
+_URGENT_RISK_LEVELS = frozenset({'High Risk', 'Medium Risk'})
+
+# Hardcoded fallback recommendations, built once at import and shared across requests
+_URGENT_RECOMMENDATIONS = (
+    {'type': 'urgent', 'text': 'Schedule consultation with an oncologist for further evaluation'},
+    {'type': 'urgent', 'text': 'Biopsy recommended for histopathological confirmation'},
+    {'type': 'monitoring', 'text': 'Close monitoring with follow-up imaging'}
+)
+_ROUTINE_RECOMMENDATIONS = (
+    {'type': 'routine', 'text': 'Monitor during next routine screening'},
+    {'type': 'routine', 'text': 'Continue standard screening interval'}
+)
+
 def calculate_risk_level(cancer_percentage: float) -> str:
     """Calculate risk level based on polyp coverage."""
-    if cancer_percentage > 2.0:
-        return 'High Risk'
-    elif cancer_percentage > 0.5:
-        return 'Medium Risk'
-    elif cancer_percentage > 0.1:
-        return 'Low Risk'
-    return 'Safe'
-
-async def get_recommendations(risk_level: str, cancer_percentage: float, statistics: dict = None) -> List[Dict[str, str]]:
+    # bisect_left keeps boundaries in the lower band (e.g. exactly 0.5% is Low Risk)
+    return _RISK_LABELS[bisect.bisect_left(_RISK_THRESHOLDS, cancer_percentage)]
+
+async def get_recommendations(risk_level: str, cancer_percentage: float, statistics: dict = None) -> Sequence[Dict[str, str]]:
     """Get AI-generated clinical recommendations, with fallback to hardcoded recommendations."""
     # Try to use AI recommendations if service is available
     if recommendation_service:
         try:
-            return await asyncio.to_thread(
-                recommendation_service.generate_recommendations,
+            return await recommendation_service.generate_recommendations_async(
                 risk_level=risk_level,
                 cancer_percentage=cancer_percentage,
                 statistics=statistics
@@ -279,38 +455,77 @@ async def get_recommendations(risk_level: str, cancer_percentage: float, statist
             print("   Falling back to hardcoded recommendations")
     
     # Fallback to hardcoded recommendations
-    if risk_level in ['High Risk', 'Medium Risk']:
-        return [
-            {'type': 'urgent', 'text': 'Schedule consultation with an oncologist for further evaluation'},
-            {'type': 'urgent', 'text': 'Biopsy recommended for histopathological confirmation'},
-            {'type': 'monitoring', 'text': 'Close monitoring with follow-up imaging'}
-        ]
+    if risk_level in _URGENT_RISK_LEVELS:
+        return _URGENT_RECOMMENDATIONS
     else:
-        return [
-            {'type': 'routine', 'text': 'Monitor during next routine screening'},
-            {'type': 'routine', 'text': 'Continue standard screening interval'}
-        ]
+        return _ROUTINE_RECOMMENDATIONS
+
+def _build_report_job(job_dir: Path, report_kwargs: dict):
+    """
+    Build a PDF report for a background job (run by Starlette's threadpool).
+    
+    Writes a "done" marker holding the PDF path once the file is complete, or
+    an "error" file if generation fails.
+    """
+    try:
+        pdf_path = create_report(output_dir=str(job_dir), **report_kwargs)
+        (job_dir / "done").write_text(pdf_path)
+    except Exception as e:
+        print(f"❌ Report job {job_dir.name} failed: {e}")
+        (job_dir / "error").write_text(str(e))
+
+def _prune_report_jobs():
+    """Delete report job directories (and their PDFs) older than REPORT_JOB_TTL_HOURS."""
+    cutoff = time.time() - REPORT_JOB_TTL_HOURS * 3600
+    try:
+        entries = list(os.scandir(REPORT_JOBS_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            expired = entry.is_dir() and entry.stat().st_mtime < cutoff
+        except FileNotFoundError:  # removed by another worker
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def _pdf_response(pdf_path: str) -> FileResponse:
+    """Return a generated PDF as a download."""
+    return FileResponse(
+        path=pdf_path,
+        media_type='application/pdf',
+        filename=Path(pdf_path).name,
+        headers={
+            "Content-Disposition": f"attachment; filename={Path(pdf_path).name}"
+        }
+    )
 
 @app.post("/generate-report")
-async def generate_report(file: UploadFile = File(...)):
+async def generate_report(
+    tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    background: bool = False
+):
     """
     Generate comprehensive PDF report for a segmentation analysis.
     
     Args:
         file: Uploaded image file
+        background: If true, build the PDF after responding and return a job id to poll
         
     Returns:
-        PDF file download
+        PDF file download, or 202 with a poll URL when background=true
     """
     if not model:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
-        # Read and process image
-        image_bytes = await file.read()
+        # Stream from the spooled upload instead of buffering it into a bytes object
+        stream = file.file
+        key = await asyncio.to_thread(_hash_stream, stream)
         
         # Validate colonoscopy image
-        is_valid, reason = validate_image_bytes(image_bytes)
+        is_valid, reason = await asyncio.to_thread(validate_image_bytes, stream)
         if not is_valid:
             print("Invalid image, please upload a colonoscopy image")
             raise HTTPException(
@@ -320,16 +535,11 @@ async def generate_report(file: UploadFile = File(...)):
         
         print(f"✔ Image passed colonoscopy validation: {file.filename}")
         
-        original_img, preprocessed_tensor = preprocess_image(image_bytes)
-        
-        # Run inference
-        prediction = await model.predict(preprocessed_tensor)
+        # Preprocess and run inference (or reuse a cached result for identical bytes)
+        original_img, prediction = await _run_inference(stream, key)
         
-        # Create overlay (binary segmentation mask)
-        overlay_img = create_overlay(original_img, prediction)
-        
-        # Create Grad-CAM heatmap (smooth gradient visualization)
-        gradcam_img = create_gradcam_overlay(original_img, prediction, alpha=0.45)
+        # Create overlay (binary segmentation mask) and Grad-CAM heatmap in one pass
+        overlay_img, gradcam_img = create_visualizations(original_img, prediction, gradcam_alpha=0.45)
         
         # Get statistics
         mask_stats = get_mask_statistics(prediction)
@@ -341,46 +551,83 @@ async def generate_report(file: UploadFile = File(...)):
         # Get AI-generated recommendations
         recommendations = await get_recommendations(risk_level, cancer_percentage, mask_stats)
         
-        # Convert images to base64
-        original_buffer = io.BytesIO()
-        original_img.save(original_buffer, format="PNG")
-        original_base64 = base64.b64encode(original_buffer.getvalue()).decode("utf-8")
-        
-        overlay_buffer = io.BytesIO()
-        overlay_img.save(overlay_buffer, format="PNG")
-        overlay_base64 = base64.b64encode(overlay_buffer.getvalue()).decode("utf-8")
+        # Encode images as raw files for the in-process report builder (no base64 round trip);
+        # JPEG is embedded by ReportLab as-is, so the photographic images skip a re-encode
+        original_bytes = img_to_bytes(original_img, "JPEG", quality=85, optimize=False)
+        overlay_bytes = img_to_bytes(overlay_img, "PNG", optimize=False, compress_level=1)
+        heatmap_bytes = img_to_bytes(gradcam_img, "JPEG", quality=85, optimize=False)
         
-        # Convert Grad-CAM to base64
-        gradcam_buffer = io.BytesIO()
-        gradcam_img.save(gradcam_buffer, format="PNG")
-        heatmap_base64 = base64.b64encode(gradcam_buffer.getvalue()).decode("utf-8")
-        
-        # Generate PDF report
-        pdf_path = create_report(
+        report_kwargs = dict(
             filename=file.filename,
-            original_image=original_base64,
-            overlay_image=overlay_base64,
-            heatmap_image=heatmap_base64,
+            original_image=original_bytes,
+            overlay_image=overlay_bytes,
+            heatmap_image=heatmap_bytes,
             statistics=mask_stats,
             risk_level=risk_level,
             confidence=0.90,  # Model confidence
             recommendations=recommendations
         )
         
+        # Hand PDF assembly off to a background task and let the client poll
+        if background:
+            job_id = uuid.uuid4().hex
+            job_dir = REPORT_JOBS_DIR / job_id
+            job_dir.mkdir(parents=True, exist_ok=True)
+            tasks.add_task(_build_report_job, job_dir, report_kwargs)
+            tasks.add_task(_prune_report_jobs)
+            return ORJSONResponse(status_code=202, content={
+                "status": "pending",
+                "job_id": job_id,
+                "poll_url": f"/report/{job_id}"
+            })
+        
+        # Generate PDF report off the event loop
+        pdf_path = await asyncio.to_thread(create_report, **report_kwargs)
+        
         # Return PDF as download
-        return FileResponse(
-            path=pdf_path,
-            media_type='application/pdf',
-            filename=Path(pdf_path).name,
-            headers={
-                "Content-Disposition": f"attachment; filename={Path(pdf_path).name}"
-            }
-        )
+        return _pdf_response(pdf_path)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
+@app.get("/report/{job_id}")
+async def get_report(job_id: str):
+    """
+    Fetch a report started with /generate-report?background=true.
+    
+    Returns:
+        PDF file download once ready, otherwise the job status
+    """
+    # Job ids are uuid4 hex strings; reject anything else before touching the filesystem
+    job_dir = REPORT_JOBS_DIR / job_id
+    if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id) or not job_dir.is_dir():
+        raise HTTPException(status_code=404, detail="Report job not found")
+    
+    done_marker = job_dir / "done"
+    if done_marker.exists():
+        return _pdf_response(done_marker.read_text())
+    
+    error_file = job_dir / "error"
+    if error_file.exists():
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {error_file.read_text()}")
+    
+    return ORJSONResponse(status_code=202, content={"status": "pending", "job_id": job_id})
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    # One model session per worker process; keep workers x ORT threads close to the core count
+    workers = int(os.environ.get("WEB_CONCURRENCY", max(1, (os.cpu_count() or 2) // 2)))
+    os.environ.setdefault("ORT_INTRA_OP_THREADS", "2")
+    os.environ.setdefault("OMP_NUM_THREADS", "2")
+    
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop is not available on Windows
+        http="httptools",
+        log_level="info"
+    )
 
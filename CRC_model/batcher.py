@@ -0,0 +1,100 @@
+"""
+Request-level micro-batching for CRC segmentation inference.
+Collects tensors from concurrent requests and runs them through the model as one batch.
+"""
+
+import numpy as np
+import asyncio
+from typing import List, Tuple
+
+from predict import CRCSegmentationModel
+
+
+class InferenceBatcher:
+    """Groups pending inference requests into a single ONNX session.run call."""
+
+    def __init__(self, model: CRCSegmentationModel, max_batch_size: int = 8, batch_timeout_ms: float = 5.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            model: Loaded CRC segmentation model
+            max_batch_size: Maximum number of tensors run together
+            batch_timeout_ms: How long to wait for more requests after the first arrives
+        """
+        self.model = model
+        self.batch_timeout_ms = batch_timeout_ms
+
+        # A model exported with a fixed batch dimension cannot take larger batches
+        fixed_batch = model.input_shape[0] if model.input_shape else None
+        if isinstance(fixed_batch, int) and fixed_batch > 0:
+            max_batch_size = min(max_batch_size, fixed_batch)
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        """Start the background task that drains the queue (requires a running loop)."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background task."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, preprocessed_tensor: np.ndarray) -> np.ndarray:
+        """
+        Queue a tensor for batched inference.
+
+        Args:
+            preprocessed_tensor: NCHW float32 tensor (1, 3, 256, 256)
+
+        Returns:
+            Binary segmentation mask (256, 256) with values 0 or 1
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((preprocessed_tensor, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Wait for one request, then gather more until the batch is full or the timeout expires."""
+        loop = asyncio.get_running_loop()
+        pending = [await self._queue.get()]
+        deadline = loop.time() + self.batch_timeout_ms / 1000.0
+
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return pending
+
+    async def _run(self):
+        """Background loop: collect, stack, run once, resolve per-request futures."""
+        while True:
+            pending = await self._collect()
+
+            try:
+                # Each tensor already carries a batch dimension of 1
+                batch = np.concatenate([tensor for tensor, _ in pending], axis=0)
+                masks = await self.model.run_batch(batch)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), mask in zip(pending, masks):
+                if not future.done():
+                    future.set_result(mask)
@@ -0,0 +1,122 @@
+"""
+Build a TensorRT engine for the CRC segmentation model with a single fixed
+optimization profile (1x3x256x256, FP16) and run it from preallocated CUDA buffers.
+A narrow profile lets TensorRT pick kernels for exactly the deployed shape.
+
+Usage:
+    python build_trt.py                # build model/crc_segmentation.fp16.plan with trtexec
+    python build_trt.py --benchmark    # build if missing, then time the engine
+"""
+
+import argparse
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+
+MODEL_DIR = Path(__file__).resolve().parent / "model"
+INPUT_SHAPE = "1x3x256x256"
+
+
+def build_engine(model_path: Path, engine_path: Path, workspace_mb: int = 2048):
+    """
+    Build an FP16 engine with trtexec, min/opt/max shapes all pinned to INPUT_SHAPE.
+
+    Args:
+        model_path: ONNX model
+        engine_path: Where to write the serialized engine
+        workspace_mb: Builder workspace limit in MB
+    """
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(str(model_path), providers=['CPUExecutionProvider']).get_inputs()[0].name
+    profile = f"{input_name}:{INPUT_SHAPE}"
+    subprocess.run([
+        "trtexec",
+        f"--onnx={model_path}",
+        f"--saveEngine={engine_path}",
+        "--fp16",
+        f"--minShapes={profile}",
+        f"--optShapes={profile}",
+        f"--maxShapes={profile}",
+        f"--memPoolSize=workspace:{workspace_mb}",
+    ], check=True)
+    print(f"✅ TensorRT engine saved to: {engine_path}")
+
+
+class TRTSegmentationEngine:
+    """Runs a serialized TensorRT engine with device buffers allocated once."""
+
+    def __init__(self, engine_path: Path):
+        """
+        Deserialize the engine and bind a persistent CUDA buffer to every I/O tensor.
+
+        Args:
+            engine_path: Engine built by build_engine
+        """
+        import tensorrt as trt
+        import torch
+
+        self._torch = torch
+        logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, "rb") as f:
+            self.engine = trt.Runtime(logger).deserialize_cuda_engine(f.read())
+        self.context = self.engine.create_execution_context()
+        self.stream = torch.cuda.Stream()
+
+        self.inputs = {}
+        self.outputs = {}
+        for i in range(self.engine.num_io_tensors):
+            name = self.engine.get_tensor_name(i)
+            dtype = torch.from_numpy(np.empty(0, dtype=trt.nptype(self.engine.get_tensor_dtype(name)))).dtype
+            buffer = torch.empty(tuple(self.engine.get_tensor_shape(name)), dtype=dtype, device="cuda")
+            self.context.set_tensor_address(name, buffer.data_ptr())
+            if self.engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT:
+                self.inputs[name] = buffer
+            else:
+                self.outputs[name] = buffer
+
+        self.input_buffer = next(iter(self.inputs.values()))
+        self.output_buffer = next(iter(self.outputs.values()))
+
+    def infer(self, preprocessed_tensor: np.ndarray) -> np.ndarray:
+        """
+        Run the engine on one preprocessed image.
+
+        Args:
+            preprocessed_tensor: NCHW float32 tensor (1, 3, 256, 256)
+
+        Returns:
+            Raw model output (1, 1, 256, 256) on the host
+        """
+        torch = self._torch
+        with torch.cuda.stream(self.stream):
+            self.input_buffer.copy_(torch.from_numpy(preprocessed_tensor), non_blocking=True)
+            self.context.execute_async_v3(self.stream.cuda_stream)
+            result = self.output_buffer.to("cpu", non_blocking=True)
+        self.stream.synchronize()
+        return result.numpy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and benchmark a TensorRT engine for the CRC model")
+    parser.add_argument("--model", type=Path, default=MODEL_DIR / "crc_segmentation.onnx")
+    parser.add_argument("--engine", type=Path, default=MODEL_DIR / "crc_segmentation.fp16.plan")
+    parser.add_argument("--workspace-mb", type=int, default=2048)
+    parser.add_argument("--benchmark", action="store_true", help="Time the engine after building")
+    args = parser.parse_args()
+
+    if not args.benchmark or not args.engine.exists():
+        build_engine(args.model, args.engine, args.workspace_mb)
+
+    if args.benchmark:
+        engine = TRTSegmentationEngine(args.engine)
+        frames = np.random.randn(20, 1, 3, 256, 256).astype(np.float32)
+        engine.infer(frames[0])  # warmup
+        start = time.perf_counter()
+        for frame in frames:
+            output = engine.infer(frame)
+        latency_ms = (time.perf_counter() - start) / len(frames) * 1000
+        print(f"Output shape: {output.shape}")
+        print(f"Average latency (TensorRT, {len(frames)} runs): {latency_ms:.2f} ms")
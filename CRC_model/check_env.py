@@ -5,7 +5,7 @@ Run this to verify your OpenAI API key is being loaded correctly.
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
 
 # Load environment variables
 env_path = Path(__file__).parent / '.env'
@@ -14,21 +14,12 @@ print(f".env file exists: {env_path.exists()}")
 
 if env_path.exists():
     print(f"\n.env file contents:")
-    with open(env_path, 'r') as f:
-        content = f.read()
-        # Mask the API key for security
-        if 'OPENAI_API_KEY' in content:
-            lines = content.split('\n')
-            for line in lines:
-                if 'OPENAI_API_KEY' in line:
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        masked_value = value[:8] + '...' + value[-4:] if len(value) > 12 else '***'
-                        print(f"  {key}={masked_value}")
-                    else:
-                        print(f"  {line}")
-                else:
-                    print(f"  {line}")
+    # Parse once with python-dotenv and mask the API key for security
+    for key, value in dotenv_values(env_path).items():
+        value = value or ''
+        if key == 'OPENAI_API_KEY':
+            value = value[:8] + '...' + value[-4:] if len(value) > 12 else '***'
+        print(f"  {key}={value}")
 else:
     print("\nERROR: .env file not found!")
     print(f"   Please create a .env file at: {env_path}")
@@ -37,7 +28,6 @@ else:
 
 # Try loading
 load_dotenv(dotenv_path=env_path)
-load_dotenv()
 
 # Check if API key is loaded
 api_key = os.getenv('OPENAI_API_KEY') or os.environ.get('OPENAI_API_KEY')
@@ -1,25 +1,63 @@
 import os
+from pathlib import Path
+import numpy as np
+import torch
 from torch.utils.data import Dataset
 from PIL import Image
 import torchvision.transforms as T
 
+# libjpeg-turbo decoder (SIMD), falls back to PIL when the library is unavailable.
+# decoding stays on the CPU: loader workers are forked and cannot initialize CUDA for nvJPEG
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _tj = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    _tj = None
+
+
+def _load_rgb(path):
+    if _tj is not None and path.lower().endswith((".jpg", ".jpeg")):
+        with open(path, "rb") as f:
+            # decodes straight to RGB, no separate convert("RGB") pass
+            return Image.fromarray(_tj.decode(f.read(), pixel_format=TJPF_RGB))
+    return Image.open(path).convert("RGB")
+
+
+def split_indices(num_samples, val_split=0.2, seed=42):
+    """Seeded permutation of range(num_samples) split into (train_idx, val_idx)."""
+    idx = np.random.default_rng(seed).permutation(num_samples)
+    val_size = int(num_samples * val_split)
+    return idx[val_size:], idx[:val_size]
+
+
 class KvasirSegDataset(Dataset):
-    def __init__(self, root_dir, transform=None, target_transform=None):
+    def __init__(self, root_dir, transform=None, target_transform=None, indices=None):
         self.image_dir = os.path.join(root_dir, "images")
         self.mask_dir = os.path.join(root_dir, "masks")
-        self.image_files = sorted(os.listdir(self.image_dir))
-        self.mask_files = sorted(os.listdir(self.mask_dir))
+
+        # one scandir pass per directory; pair images and masks by filename stem
+        images = {Path(e.name).stem: e.name for e in os.scandir(self.image_dir) if e.is_file()}
+        masks = {Path(e.name).stem: e.name for e in os.scandir(self.mask_dir) if e.is_file()}
+        unmatched = images.keys() ^ masks.keys()
+        if unmatched:
+            raise ValueError(f"Images and masks do not match: {sorted(unmatched)[:5]}")
+        self.samples = [(images[stem], masks[stem]) for stem in sorted(images)]
+        # a train/val split selects its samples here, instead of a Subset wrapper per access
+        if indices is not None:
+            self.samples = [self.samples[i] for i in indices]
+
         self.transform = transform
         self.target_transform = target_transform
 
     def __len__(self):
-        return len(self.image_files)
+        return len(self.samples)
 
     def __getitem__(self, idx):
-        img_path = os.path.join(self.image_dir, self.image_files[idx])
-        mask_path = os.path.join(self.mask_dir, self.mask_files[idx])
+        img_name, mask_name = self.samples[idx]
+        img_path = os.path.join(self.image_dir, img_name)
+        mask_path = os.path.join(self.mask_dir, mask_name)
 
-        image = Image.open(img_path).convert("RGB")
+        image = _load_rgb(img_path)
         mask = Image.open(mask_path).convert("L")  # grayscale
 
         if self.transform:
@@ -28,3 +66,25 @@ class KvasirSegDataset(Dataset):
             mask = self.target_transform(mask)
 
         return image, mask
+
+
+class CachedKvasirDataset(Dataset):
+    """Pre-resized uint8 images/masks from training/cache_dataset.py, memory-mapped."""
+
+    def __init__(self, cache_path, indices=None):
+        try:
+            data = torch.load(cache_path, mmap=True)
+        except TypeError:  # PyTorch < 2.1 has no mmap loading
+            data = torch.load(cache_path)
+        self.images = data["images"]  # (N, 3, H, W) uint8
+        self.masks = data["masks"]    # (N, 1, H, W) uint8
+        # split rows are looked up per item; fancy-indexing the tensors would copy them out of the mmap
+        self.indices = np.arange(len(self.images)) if indices is None else np.asarray(indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        i = self.indices[idx]
+        # images stay uint8 for DeviceNormalize; masks match ToTensor's [0, 1] floats
+        return self.images[i], self.masks[i].float().div_(255)
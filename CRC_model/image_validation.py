@@ -4,10 +4,197 @@ Uses heuristic checks to reject non-colonoscopy images.
 """
 
 import numpy as np
+import cv2
 from PIL import Image
-from typing import Tuple
+from typing import BinaryIO, Tuple, Union
 import io
 
+# Numba is optional; without it the color masks fall back to NumPy reductions
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# The color, vignette and variance heuristics are ratios/means, so they run on a fixed-size
+# thumbnail. The edge check is a gradient magnitude, which resampling changes, so it reads
+# the full-resolution center crop rescaled to a fixed pixel density (see _center_edge_strength)
+VALIDATION_SIZE = (256, 256)
+
+# The edge threshold applies at the scale of a 720x576 frame (standard-definition endoscope
+# output); larger uploads have their center crop shrunk to the same area
+EDGE_REFERENCE_AREA = 720 * 576
+
+# Color categories as bit flags, resolved through per-channel lookup tables so every
+# pixel is classified by three byte gathers and two ANDs (OpenCV hue is 0-179)
+RED_PINK_BROWN = 1  # hue 0-30 or 165-179, saturation > 20
+BLUE_GREEN = 2      # hue 50-130, saturation > 50
+YELLOW = 4          # hue 20-30, saturation > 50, value > 200
+WHITE_LIGHT = 8     # saturation < 30, value > 220 (any hue)
+
+_HUE_LUT = np.full(256, WHITE_LIGHT, dtype=np.uint8)
+_HUE_LUT[0:31] |= RED_PINK_BROWN
+_HUE_LUT[165:180] |= RED_PINK_BROWN
+_HUE_LUT[50:131] |= BLUE_GREEN
+_HUE_LUT[20:31] |= YELLOW
+
+_SAT_LUT = np.zeros(256, dtype=np.uint8)
+_SAT_LUT[21:] |= RED_PINK_BROWN
+_SAT_LUT[51:] |= BLUE_GREEN | YELLOW
+_SAT_LUT[:30] |= WHITE_LIGHT
+
+_VAL_LUT = np.full(256, RED_PINK_BROWN | BLUE_GREEN, dtype=np.uint8)
+_VAL_LUT[201:] |= YELLOW
+_VAL_LUT[221:] |= WHITE_LIGHT
+
+# Both variants take flat uint8 HSV planes and return
+# (red_pink_brown, white_light, blue_green, yellow) pixel counts
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _count_categories(h_channel, s_channel, v_channel, hue_lut, sat_lut, val_lut):
+        """Classify and count every pixel in one fused parallel pass."""
+        red_pink_brown = 0
+        white_light = 0
+        blue_green = 0
+        yellow = 0
+        for i in prange(h_channel.size):
+            code = hue_lut[h_channel[i]] & sat_lut[s_channel[i]] & val_lut[v_channel[i]]
+            red_pink_brown += code & 1
+            blue_green += (code >> 1) & 1
+            yellow += (code >> 2) & 1
+            white_light += (code >> 3) & 1
+        return red_pink_brown, white_light, blue_green, yellow
+    
+    def _count_color_masks(h_channel, s_channel, v_channel):
+        """Count red/pink/brown, white/light, blue/green and yellow pixels."""
+        return _count_categories(h_channel, s_channel, v_channel, _HUE_LUT, _SAT_LUT, _VAL_LUT)
+else:
+    _FLAG_BITS = np.arange(16)
+    
+    def _count_color_masks(h_channel, s_channel, v_channel):
+        """Count red/pink/brown, white/light, blue/green and yellow pixels."""
+        codes = _HUE_LUT[h_channel] & _SAT_LUT[s_channel] & _VAL_LUT[v_channel]
+        counts = np.bincount(codes, minlength=16)
+        return tuple(
+            int(counts[(_FLAG_BITS & flag) != 0].sum())
+            for flag in (RED_PINK_BROWN, WHITE_LIGHT, BLUE_GREEN, YELLOW)
+        )
+
+
+# Both variants return (mean_r, mean_g, mean_b, mean_s, edge_brightness, center_brightness, center_std)
+# for a uint8 RGB image and its saturation/value planes. Edge brightness pools the four
+# border strips (corners count once per strip); center_std averages the per-channel stds.
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _region_statistics(rgb, s_channel, v_channel, edge_height, edge_width,
+                           center_y_start, center_y_end, center_x_start, center_x_end):
+        """Gather every mean/std the vignette and variance checks need in one parallel pass."""
+        height, width = v_channel.shape
+        sum_r = 0.0
+        sum_g = 0.0
+        sum_b = 0.0
+        sum_s = 0.0
+        edge_sum = 0.0
+        center_v = 0.0
+        center_r = 0.0
+        center_g = 0.0
+        center_b = 0.0
+        center_rr = 0.0
+        center_gg = 0.0
+        center_bb = 0.0
+        for y in prange(height):
+            in_rows = (y < edge_height) + (y >= height - edge_height)
+            in_center_rows = center_y_start <= y < center_y_end
+            for x in range(width):
+                r = float(rgb[y, x, 0])
+                g = float(rgb[y, x, 1])
+                b = float(rgb[y, x, 2])
+                v = float(v_channel[y, x])
+                sum_r += r
+                sum_g += g
+                sum_b += b
+                sum_s += float(s_channel[y, x])
+                edge_sum += v * (in_rows + (x < edge_width) + (x >= width - edge_width))
+                if in_center_rows and center_x_start <= x < center_x_end:
+                    center_v += v
+                    center_r += r
+                    center_g += g
+                    center_b += b
+                    center_rr += r * r
+                    center_gg += g * g
+                    center_bb += b * b
+        
+        n = height * width
+        edge_count = 2 * edge_height * width + 2 * edge_width * height
+        center_n = (center_y_end - center_y_start) * (center_x_end - center_x_start)
+        mean_cr = center_r / center_n
+        mean_cg = center_g / center_n
+        mean_cb = center_b / center_n
+        center_std = (
+            np.sqrt(max(center_rr / center_n - mean_cr * mean_cr, 0.0)) +
+            np.sqrt(max(center_gg / center_n - mean_cg * mean_cg, 0.0)) +
+            np.sqrt(max(center_bb / center_n - mean_cb * mean_cb, 0.0))
+        ) / 3.0
+        return (sum_r / n, sum_g / n, sum_b / n, sum_s / n,
+                edge_sum / edge_count, center_v / center_n, center_std)
+else:
+    def _region_statistics(rgb, s_channel, v_channel, edge_height, edge_width,
+                           center_y_start, center_y_end, center_x_start, center_x_end):
+        """Gather every mean/std the vignette and variance checks need."""
+        height, width = v_channel.shape
+        mean_r, mean_g, mean_b = rgb.reshape(-1, 3).mean(axis=0, dtype=np.float64)
+        mean_s = np.mean(s_channel, dtype=np.float64)
+        
+        top_edge = v_channel[0:edge_height, :]
+        bottom_edge = v_channel[height-edge_height:height, :]
+        left_edge = v_channel[:, 0:edge_width]
+        right_edge = v_channel[:, width-edge_width:width]
+        edge_sum = top_edge.sum() + bottom_edge.sum() + left_edge.sum() + right_edge.sum()
+        edge_count = top_edge.size + bottom_edge.size + left_edge.size + right_edge.size
+        
+        center = (slice(center_y_start, center_y_end), slice(center_x_start, center_x_end))
+        center_brightness = np.mean(v_channel[center], dtype=np.float64)
+        center_std = np.mean(rgb[center].reshape(-1, 3).std(axis=0, dtype=np.float64))
+        return (mean_r, mean_g, mean_b, mean_s,
+                edge_sum / edge_count, center_brightness, center_std)
+
+
+def _center_edge_strength(image: Image.Image) -> float:
+    """
+    Mean absolute neighbor difference over the center 40% of the image, measured as if
+    the image were a 720x576 frame.
+    
+    Per-pixel noise and JPEG artifacts don't shrink with resolution but tissue gradients
+    do, so on larger uploads the crop is box-averaged (aspect ratio kept) down to the area
+    it has in a frame of EDGE_REFERENCE_AREA pixels. Smaller uploads are measured as is:
+    upsampling adds no detail and would only blur the sharp strokes this check looks for.
+    
+    Args:
+        image: RGB PIL Image at its original resolution
+        
+    Returns:
+        float: Edge strength (higher means more sharp edges)
+    """
+    width, height = image.size
+    scale = (EDGE_REFERENCE_AREA / (width * height)) ** 0.5
+    if scale >= 1.0:
+        box = (int(width * 0.3), int(height * 0.3), int(width * 0.7), int(height * 0.7))
+        center = np.asarray(image.crop(box))
+    else:
+        # Resample the exact fractional box so every size covers the same scene region;
+        # box averaging is what a lower-resolution sensor would record
+        box = (width * 0.3, height * 0.3, width * 0.7, height * 0.7)
+        size = (round(width * 0.4 * scale), round(height * 0.4 * scale))
+        center = np.asarray(image.resize(size, Image.BOX, box=box))
+    # Gray is the plain channel mean, not luma: luma reads uncorrelated per-channel noise
+    # higher and would shift the threshold. Differences are taken on the int16 channel sum
+    # (at most 765) and divided by 3 once at the end.
+    center_sum = center.sum(axis=2, dtype=np.int16)
+    # Simple edge detection: mean of absolute vertical and horizontal differences;
+    # the center of a >=300x300 image is never empty
+    h_diff = np.abs(np.diff(center_sum, axis=0))
+    v_diff = np.abs(np.diff(center_sum, axis=1))
+    return (h_diff.mean() + v_diff.mean()) / 6.0
+
 
 def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     """
@@ -19,35 +206,42 @@ def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     Returns:
         tuple: (is_valid: bool, reason: str)
     """
+    # 1. Check image size (on the original dimensions)
+    width, height = image.size
+    if width < 300 or height < 300:
+        return False, "image too small (minimum 300x300 required)"
+    
     # Convert to RGB if necessary
     if image.mode != 'RGB':
         image = image.convert('RGB')
     
+    # Edge strength comes from the full-resolution center at a fixed scale, not from the
+    # thumbnail (its resize would smooth exactly the edges it measures)
+    edge_strength = _center_edge_strength(image)
+    image = image.resize(VALIDATION_SIZE, Image.BILINEAR)
     width, height = image.size
-    img_array = np.array(image, dtype=np.float32)
-    
-    # 1. Check image size
-    if width < 300 or height < 300:
-        return False, "image too small (minimum 300x300 required)"
+    # Stay in uint8; only the reductions below accumulate in float64
+    img_array = np.asarray(image)
     
     # 2. Check color distribution
-    # Convert to HSV for better color analysis
-    hsv_array = np.array(image.convert('HSV'), dtype=np.float32)
-    h_channel = hsv_array[:, :, 0]  # Hue (0-179 in PIL)
-    s_channel = hsv_array[:, :, 1]  # Saturation (0-255)
-    v_channel = hsv_array[:, :, 2]  # Value/Brightness (0-255)
-    
-    # RGB channels for red/blue comparison
-    r_channel = img_array[:, :, 0]
-    g_channel = img_array[:, :, 1]
-    b_channel = img_array[:, :, 2]
-    
-    # Calculate mean values
-    mean_r = np.mean(r_channel)
-    mean_g = np.mean(g_channel)
-    mean_b = np.mean(b_channel)
-    mean_s = np.mean(s_channel)
-    mean_v = np.mean(v_channel)
+    # Convert to HSV for better color analysis (OpenCV's SIMD kernel; hue is 0-179)
+    # cv2.split yields contiguous uint8 planes, so all mask compares stay in byte lanes
+    hsv_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2HSV)
+    h_channel, s_channel, v_channel = cv2.split(hsv_array)  # Hue (0-179 in OpenCV), Saturation, Value (0-255)
+    
+    # Edge region (outer 20% of image) and center region (middle 40% of image)
+    edge_width = int(width * 0.2)
+    edge_height = int(height * 0.2)
+    center_x_start = int(width * 0.3)
+    center_x_end = int(width * 0.7)
+    center_y_start = int(height * 0.3)
+    center_y_end = int(height * 0.7)
+    
+    # Channel means, vignette brightness and center variance, all from one pass
+    mean_r, mean_g, mean_b, mean_s, edge_brightness, center_brightness, avg_std = _region_statistics(
+        img_array, s_channel, v_channel, edge_height, edge_width,
+        center_y_start, center_y_end, center_x_start, center_x_end
+    )
     
     # Check: Red channel should be higher than Blue
     # Colonoscopy images have red/pink/brown tones - red should be at least 15% higher than blue
@@ -63,24 +257,23 @@ def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     if mean_s < 30:  # Very low saturation indicates grayscale
         return False, "color mismatch (image appears grayscale)"
     
+    # Count all hue/saturation/value masks in a single pass over the pixels
+    red_pink_brown_pixels, white_light_pixels, blue_green_pixels, yellow_pixels = _count_color_masks(
+        h_channel.ravel(), s_channel.ravel(), v_channel.ravel()
+    )
+    
     # Check: Colonoscopy images should have significant red/pink/brown color dominance
     # Hue ranges: Red ~0-15 and 165-179, Pink/Brown ~5-25, Orange/Brown ~10-30
     # Count pixels in colonoscopy-typical color ranges (red, pink, brown, orange tones)
-    red_pink_brown_mask = (
-        ((h_channel >= 0) & (h_channel <= 30)) |  # Red to orange range
-        ((h_channel >= 165) & (h_channel <= 179))  # Red wrap-around range
-    ) & (s_channel > 20)  # Must have some saturation
-    
-    red_pink_brown_ratio = np.sum(red_pink_brown_mask) / (width * height)
+    red_pink_brown_ratio = red_pink_brown_pixels / (width * height)
     
     # Colonoscopy images should have at least 20% of pixels in red/pink/brown range (more lenient)
     if red_pink_brown_ratio < 0.20:
         return False, "color mismatch (insufficient red/pink/brown color dominance)"
     
     # Check: Reject images with too much white/light background (common in screenshots/graphs)
-    # Colonoscopy images have darker, more saturated colors
-    white_light_mask = (v_channel > 220) & (s_channel < 30)  # Very bright, low saturation
-    white_light_ratio = np.sum(white_light_mask) / (width * height)
+    # Colonoscopy images have darker, more saturated colors (very bright, low saturation)
+    white_light_ratio = white_light_pixels / (width * height)
     
     # If more than 60% of image is white/light background, likely not colonoscopy (more lenient)
     if white_light_ratio > 0.60:
@@ -89,11 +282,8 @@ def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     # Check: Reject images dominated by bright blue/green/yellow
     # Colonoscopy images are typically red/pink/brown, not bright blue/green
     # Hue ranges: Red ~0-10 and 170-179, Yellow ~20-30, Green ~50-70, Blue ~100-130
-    blue_green_mask = ((h_channel >= 50) & (h_channel <= 130)) & (s_channel > 50)
-    yellow_mask = ((h_channel >= 20) & (h_channel <= 30)) & (s_channel > 50) & (v_channel > 200)
-    
-    blue_green_ratio = np.sum(blue_green_mask) / (width * height)
-    yellow_ratio = np.sum(yellow_mask) / (width * height)
+    blue_green_ratio = blue_green_pixels / (width * height)
+    yellow_ratio = yellow_pixels / (width * height)
     
     # If more than 30% of image is bright blue/green/yellow, reject (stricter threshold)
     if blue_green_ratio > 0.30 or yellow_ratio > 0.25:
@@ -101,35 +291,6 @@ def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     
     # 3. Detect circular/rounded frame (vignette)
     # Colonoscopy images typically have dark edges (vignette) and brighter center
-    center_x, center_y = width // 2, height // 2
-    
-    # Define edge region (outer 20% of image)
-    edge_width = int(width * 0.2)
-    edge_height = int(height * 0.2)
-    
-    # Extract edge regions (top, bottom, left, right)
-    top_edge = v_channel[0:edge_height, :]
-    bottom_edge = v_channel[height-edge_height:height, :]
-    left_edge = v_channel[:, 0:edge_width]
-    right_edge = v_channel[:, width-edge_width:width]
-    
-    # Average brightness of edges
-    edge_brightness = np.mean([
-        np.mean(top_edge),
-        np.mean(bottom_edge),
-        np.mean(left_edge),
-        np.mean(right_edge)
-    ])
-    
-    # Extract center region (middle 40% of image)
-    center_x_start = int(width * 0.3)
-    center_x_end = int(width * 0.7)
-    center_y_start = int(height * 0.3)
-    center_y_end = int(height * 0.7)
-    
-    center_region = v_channel[center_y_start:center_y_end, center_x_start:center_x_end]
-    center_brightness = np.mean(center_region)
-    
     # Check: Edges should be significantly darker than center (vignette effect)
     # Colonoscopy images have a strong vignette effect - edges should be much darker
     brightness_ratio = edge_brightness / (center_brightness + 1e-6)  # Avoid division by zero
@@ -145,19 +306,7 @@ def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     
     # 4. Check for color variance (colonoscopy images have natural color variation)
     # Screenshots/graphs often have very uniform colors or sharp color boundaries
-    # Calculate color variance in the center region
-    center_r = r_channel[center_y_start:center_y_end, center_x_start:center_x_end]
-    center_g = g_channel[center_y_start:center_y_end, center_x_start:center_x_end]
-    center_b = b_channel[center_y_start:center_y_end, center_x_start:center_x_end]
-    
-    # Calculate standard deviation of each channel in center
-    std_r = np.std(center_r)
-    std_g = np.std(center_g)
-    std_b = np.std(center_b)
-    
-    # Average standard deviation across channels
-    avg_std = (std_r + std_g + std_b) / 3.0
-    
+    # avg_std is the mean of the per-channel standard deviations in the center region
     # Colonoscopy images should have reasonable color variation (not too uniform)
     # If standard deviation is too low, image might be too uniform (like a graph background)
     # More lenient threshold - only catch very uniform images
@@ -166,39 +315,33 @@ def validate_colonoscopy_image(image: Image.Image) -> Tuple[bool, str]:
     
     # Additional check: Reject images with too many high-contrast edges (common in screenshots/graphs)
     # Colonoscopy images have smooth, organic transitions
-    # Calculate edge density using simple gradient on center region
-    center_gray = (center_r + center_g + center_b) / 3.0
-    # Simple edge detection: calculate mean of absolute differences
-    try:
-        h_diff = np.abs(np.diff(center_gray, axis=0))
-        v_diff = np.abs(np.diff(center_gray, axis=1))
-        edge_strength = (np.mean(h_diff) + np.mean(v_diff)) / 2.0
-        
-        # Screenshots/graphs have many sharp edges, colonoscopy images have smoother transitions
-        # If edge strength is too high, likely a screenshot or graph
-        # More lenient - only reject images with very high edge density (like text/graphs)
-        if edge_strength > 35:  # Too many sharp edges (raised from 25)
-            return False, "color mismatch (too many sharp edges, likely not a colonoscopy image)"
-    except:
-        # If edge detection fails, skip this check (shouldn't happen, but graceful degradation)
-        pass
+    # edge_strength is the mean absolute neighbor difference of the center region, at no
+    # more than 720x576 scale
+    
+    # Screenshots/graphs have many sharp edges, colonoscopy images have smoother transitions
+    # If edge strength is too high, likely a screenshot or graph
+    # More lenient - only reject images with very high edge density (like text/graphs)
+    if edge_strength > 35:  # Too many sharp edges (raised from 25)
+        return False, "color mismatch (too many sharp edges, likely not a colonoscopy image)"
     
     # All checks passed
     return True, "validation passed"
 
 
-def validate_image_bytes(image_bytes: bytes) -> Tuple[bool, str]:
+def validate_image_bytes(image_bytes: Union[bytes, BinaryIO]) -> Tuple[bool, str]:
     """
     Validate image from bytes.
     
     Args:
-        image_bytes: Raw image bytes
+        image_bytes: Raw image bytes, or a binary file object positioned at the start of the image
         
     Returns:
         tuple: (is_valid: bool, reason: str)
     """
     try:
-        image = Image.open(io.BytesIO(image_bytes))
+        if isinstance(image_bytes, (bytes, bytearray)):
+            image_bytes = io.BytesIO(image_bytes)
+        image = Image.open(image_bytes)
         return validate_colonoscopy_image(image)
     except Exception as e:
         return False, f"failed to load image: {str(e)}"
@@ -3,11 +3,21 @@ LLM Service for generating AI-powered clinical recommendations.
 Uses OpenAI API to generate personalized recommendations based on analysis results.
 """
 
+import asyncio
 import os
+import re
 from typing import List, Dict
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# h2 is optional; without it the shared client stays on HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Load environment variables from .env file
 # First try root directory (parent of CRC_model)
@@ -23,6 +33,36 @@ if env_path.exists():
 # Also try loading from current directory
 load_dotenv()
 
+# Keyword scans for _parse_recommendations, compiled once (plain substring matches, e.g. "monitor" matches "monitoring")
+_URGENT_KEYWORDS_RE = re.compile(r'urgent|immediate|biopsy|oncologist|consultation|asap')
+_MONITORING_KEYWORDS_RE = re.compile(r'monitor|follow-up|follow up|surveillance')
+# Leading numbering/bullets such as "1. ", "- ", "* ", "• ", "2) "
+_LIST_MARKER_RE = re.compile(r'^[0-9.\-*•) ]+')
+
+# One OpenAI client per process so every service instance shares its connection pool
+_client = None
+_async_client = None
+
+def _get_client(api_key: str) -> OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = OpenAI(
+            api_key=api_key,
+            http_client=httpx.Client(http2=HTTP2_AVAILABLE, timeout=30.0)
+        )
+    return _client
+
+def _get_async_client(api_key: str) -> AsyncOpenAI:
+    """Return the process-wide async OpenAI client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=30.0)
+        )
+    return _async_client
+
 class RecommendationService:
     """Service for generating AI-powered clinical recommendations."""
     
@@ -44,7 +84,8 @@ class RecommendationService:
             )
         
         print(f"OpenAI API key loaded successfully (length: {len(api_key)} chars)")
-        self.client = OpenAI(api_key=api_key)
+        self.client = _get_client(api_key)
+        self.async_client = _get_async_client(api_key)
         self.model = "gpt-4o-mini"  # Using cost-effective model
     
     def generate_recommendations(
@@ -70,6 +111,66 @@ class RecommendationService:
         Returns:
             List of recommendation dictionaries with 'type' and 'text' keys
         """
+        request = self._build_request(
+            risk_level, cancer_percentage, statistics, findings, segmentation_summary, gradcam_summary
+        )
+        
+        try:
+            response = self.client.chat.completions.create(**request)
+            return self._handle_response(response, risk_level)
+        except Exception as e:
+            self._log_failure(e)
+            # Re-raise the exception so the caller knows it failed
+            raise
+    
+    async def generate_recommendations_async(
+        self,
+        risk_level: str,
+        cancer_percentage: float,
+        statistics: dict = None,
+        findings: str = None,
+        segmentation_summary: str = None,
+        gradcam_summary: str = None
+    ) -> List[Dict[str, str]]:
+        """
+        Async variant of generate_recommendations using the shared AsyncOpenAI client.
+        
+        Args and Returns are the same as generate_recommendations.
+        """
+        request = self._build_request(
+            risk_level, cancer_percentage, statistics, findings, segmentation_summary, gradcam_summary
+        )
+        
+        try:
+            response = await self.async_client.chat.completions.create(**request)
+            return self._handle_response(response, risk_level)
+        except Exception as e:
+            self._log_failure(e)
+            raise
+    
+    async def generate_recommendations_batch(self, cases: List[dict]) -> List[List[Dict[str, str]]]:
+        """
+        Generate recommendations for several cases with overlapping API calls.
+        
+        Args:
+            cases: List of keyword-argument dicts for generate_recommendations
+                   (risk_level, cancer_percentage, and optional statistics etc.)
+            
+        Returns:
+            List of recommendation lists, in the same order as cases
+        """
+        return await asyncio.gather(*[self.generate_recommendations_async(**case) for case in cases])
+    
+    def _build_request(
+        self,
+        risk_level: str,
+        cancer_percentage: float,
+        statistics: dict = None,
+        findings: str = None,
+        segmentation_summary: str = None,
+        gradcam_summary: str = None
+    ) -> dict:
+        """Build the chat completion arguments for one case."""
         # Prepare context for AI
         context_parts = []
         
@@ -111,48 +212,42 @@ For {risk_level} cases:
 
 Return ONLY the recommendations, one per line, without numbering or bullets."""
 
-        try:
-            print(f"Calling OpenAI API with model: {self.model}")
-            print(f"   Risk Level: {risk_level}, Coverage: {cancer_percentage:.2f}%")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a medical AI assistant specializing in colorectal cancer screening and diagnosis. Provide clear, evidence-based clinical recommendations."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=300
-            )
-            
-            # Extract recommendations from response
-            recommendations_text = response.choices[0].message.content.strip()
-            print(f"Raw AI response received ({len(recommendations_text)} chars):")
-            print(f"   {recommendations_text[:200]}...")
-            
-            # Parse recommendations into structured format
-            recommendations = self._parse_recommendations(recommendations_text, risk_level)
-            
-            if recommendations and len(recommendations) > 0:
-                print(f"Successfully parsed {len(recommendations)} recommendations from AI response")
-                return recommendations
-            else:
-                print("ERROR: Failed to parse recommendations from AI response")
-                raise ValueError("Failed to parse AI recommendations")
-            
-        except Exception as e:
-            import traceback
-            print(f"ERROR: Error generating AI recommendations: {type(e).__name__}: {e}")
-            print("   Full traceback:")
-            traceback.print_exc()
-            # Re-raise the exception so the caller knows it failed
-            raise
+        return dict(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a medical AI assistant specializing in colorectal cancer screening and diagnosis. Provide clear, evidence-based clinical recommendations."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.7,
+            max_tokens=180  # 3-5 one-line recommendations fit well within this
+        )
+    
+    def _handle_response(self, response, risk_level: str) -> List[Dict[str, str]]:
+        """Extract and parse the recommendations from a chat completion."""
+        # Extract recommendations from response
+        recommendations_text = response.choices[0].message.content.strip()
+        
+        # Parse recommendations into structured format
+        recommendations = self._parse_recommendations(recommendations_text, risk_level)
+        
+        if recommendations and len(recommendations) > 0:
+            return recommendations
+        else:
+            print("ERROR: Failed to parse recommendations from AI response")
+            raise ValueError("Failed to parse AI recommendations")
+    
+    def _log_failure(self, e: Exception):
+        """Print a failed API call with its traceback."""
+        import traceback
+        print(f"ERROR: Error generating AI recommendations: {type(e).__name__}: {e}")
+        print("   Full traceback:")
+        traceback.print_exc()
     
     def _parse_recommendations(self, text: str, risk_level: str) -> List[Dict[str, str]]:
         """
@@ -171,7 +266,7 @@ Return ONLY the recommendations, one per line, without numbering or bullets."""
         recommendations = []
         for line in lines:
             # Remove numbering, bullets, etc.
-            clean_line = line.lstrip('0123456789.-*•) ').strip()
+            clean_line = _LIST_MARKER_RE.sub('', line).strip()
             
             if not clean_line:
                 continue
@@ -181,14 +276,14 @@ Return ONLY the recommendations, one per line, without numbering or bullets."""
             rec_type = 'routine'
             
             if risk_level in ['High Risk', 'Medium Risk']:
-                if any(keyword in lower_line for keyword in ['urgent', 'immediate', 'biopsy', 'oncologist', 'consultation', 'asap']):
+                if _URGENT_KEYWORDS_RE.search(lower_line):
                     rec_type = 'urgent'
-                elif any(keyword in lower_line for keyword in ['monitor', 'follow-up', 'follow up', 'surveillance']):
+                elif _MONITORING_KEYWORDS_RE.search(lower_line):
                     rec_type = 'monitoring'
                 else:
                     rec_type = 'urgent'  # Default to urgent for high/medium risk
             else:
-                if any(keyword in lower_line for keyword in ['monitor', 'follow-up', 'follow up', 'surveillance']):
+                if _MONITORING_KEYWORDS_RE.search(lower_line):
                     rec_type = 'monitoring'
                 else:
                     rec_type = 'routine'
@@ -1,6 +1,7 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 import timm  # for EfficientNet backbone
 
 
@@ -20,11 +21,35 @@ class ConvBlock(nn.Module):
     def forward(self, x):
         return self.conv(x)
 
+    def fuse(self):
+        """Fold each BatchNorm into the preceding Conv2d (eval mode only); BN slots become Identity"""
+        for i in range(len(self.conv) - 1):
+            if isinstance(self.conv[i], nn.Conv2d) and isinstance(self.conv[i + 1], nn.BatchNorm2d):
+                self.conv[i] = fuse_conv_bn_eval(self.conv[i], self.conv[i + 1])
+                self.conv[i + 1] = nn.Identity()
+
+
+class UpBlock(nn.Module):
+    """Decoder upsampling: nearest-neighbour x2 -> Conv (avoids ConvTranspose2d checkerboarding)"""
+    def __init__(self, in_channels, out_channels):
+        super(UpBlock, self).__init__()
+        self.up = nn.Sequential(
+            nn.Upsample(scale_factor=2, mode="nearest"),
+            nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
+        )
+
+    def forward(self, x):
+        return self.up(x)
+
 
 class UNetEffNet(nn.Module):
-    def __init__(self, backbone_name="efficientnet_b0", num_classes=1, pretrained=True):
+    def __init__(self, backbone_name="efficientnet_b0", num_classes=1, pretrained=True, apply_sigmoid=True):
         super(UNetEffNet, self).__init__()
 
+        # Probabilities in [0, 1] by default, which exported models and predict.py rely on;
+        # training passes apply_sigmoid=False to feed raw logits to BCEWithLogits
+        self.apply_sigmoid = apply_sigmoid
+
         # Load EfficientNet backbone
         self.encoder = timm.create_model(backbone_name, features_only=True, pretrained=pretrained)
 
@@ -32,16 +57,16 @@ class UNetEffNet(nn.Module):
         self.decoder_channels = [256, 128, 64, 32]
 
         # Decoder layers
-        self.up4 = nn.ConvTranspose2d(encoder_channels[-1], self.decoder_channels[0], kernel_size=2, stride=2)
+        self.up4 = UpBlock(encoder_channels[-1], self.decoder_channels[0])
         self.conv4 = ConvBlock(encoder_channels[-2] + self.decoder_channels[0], self.decoder_channels[0])
 
-        self.up3 = nn.ConvTranspose2d(self.decoder_channels[0], self.decoder_channels[1], kernel_size=2, stride=2)
+        self.up3 = UpBlock(self.decoder_channels[0], self.decoder_channels[1])
         self.conv3 = ConvBlock(encoder_channels[-3] + self.decoder_channels[1], self.decoder_channels[1])
 
-        self.up2 = nn.ConvTranspose2d(self.decoder_channels[1], self.decoder_channels[2], kernel_size=2, stride=2)
+        self.up2 = UpBlock(self.decoder_channels[1], self.decoder_channels[2])
         self.conv2 = ConvBlock(encoder_channels[-4] + self.decoder_channels[2], self.decoder_channels[2])
 
-        self.up1 = nn.ConvTranspose2d(self.decoder_channels[2], self.decoder_channels[3], kernel_size=2, stride=2)
+        self.up1 = UpBlock(self.decoder_channels[2], self.decoder_channels[3])
         self.conv1 = ConvBlock(encoder_channels[-5] + self.decoder_channels[3], self.decoder_channels[3])
 
         # Final segmentation head
@@ -70,9 +95,22 @@ class UNetEffNet(nn.Module):
         d1 = self.conv1(d1)
 
         out = self.final_conv(d1)
-        out = torch.sigmoid(out)  # sigmoid for binary segmentation
+        if self.apply_sigmoid:
+            out = torch.sigmoid(out)  # sigmoid for binary segmentation
         return out
 
+    def fuse_conv_bn(self):
+        """
+        Fold the decoder's Conv+BN pairs for inference (e.g. before ONNX export).
+        Call after model.eval(); the fused model should not be trained further.
+        """
+        if self.training:
+            raise RuntimeError("fuse_conv_bn() requires eval mode; call model.eval() first")
+        for module in self.modules():
+            if isinstance(module, ConvBlock):
+                module.fuse()
+        return self
+
 
 if __name__ == "__main__":
     model = UNetEffNet(backbone_name="efficientnet_b4", num_classes=1)
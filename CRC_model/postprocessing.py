@@ -13,6 +13,56 @@ from pathlib import Path
 CANCER_COLOR = (255, 0, 0, 180)  # Red with transparency
 BACKGROUND_COLOR = (0, 0, 0, 0)  # Transparent
 
+def _blend_mask_native(original_image: Image.Image, mask: np.ndarray) -> Image.Image:
+    """Alpha-blend CANCER_COLOR over the original image at its own resolution where mask == 1."""
+    if original_image.mode != 'RGB':
+        original_image = original_image.convert('RGB')
+    
+    original = np.asarray(original_image)
+    height, width = original.shape[:2]
+    
+    # Nearest-neighbour keeps the upsampled mask binary
+    selected = cv2.resize(mask.astype(np.uint8), (width, height), interpolation=cv2.INTER_NEAREST).view(bool)
+    
+    # Blend only the masked pixels, so temporaries scale with the lesion area rather than
+    # the frame (nothing full-resolution is kept between requests)
+    alpha = CANCER_COLOR[3] / 255.0
+    color = np.array(CANCER_COLOR[:3], dtype=np.float32) * alpha
+    result = original.copy()
+    result[selected] = (original[selected] * np.float32(1 - alpha) + color + 0.5).astype(np.uint8)
+    return Image.fromarray(result)
+
+def _heatmap_colors(heatmap: np.ndarray) -> np.ndarray:
+    """
+    Turn a heatmap or binary mask into JET colors.
+    
+    Args:
+        heatmap: Grad-CAM heatmap (float32, range [0, 1]) or binary mask
+        
+    Returns:
+        RGB uint8 array (H, W, 3)
+    """
+    # Ensure heatmap is float32
+    heatmap = heatmap.astype(np.float32)
+
+    # If binary, make it smoother with a separable Gaussian falloff around the mask
+    if heatmap.max() <= 1.0 and len(np.unique(heatmap)) <= 2:
+        if np.sum(heatmap) > 0:
+            heatmap = cv2.GaussianBlur(heatmap, (0, 0), sigmaX=max(heatmap.shape) // 16)
+            heatmap /= heatmap.max() + 1e-6  # mask center = hottest
+        else:
+            heatmap = np.zeros_like(heatmap, dtype=np.float32)
+
+    # Normalize to 0–1
+    heatmap = np.clip(heatmap, 0, 1)
+    if heatmap.max() > 0:
+        heatmap /= heatmap.max()
+
+    # Apply JET colormap
+    heatmap_uint8 = np.uint8(255 * heatmap)
+    heatmap_color = cv2.applyColorMap(heatmap_uint8, cv2.COLORMAP_JET)
+    return cv2.cvtColor(heatmap_color, cv2.COLOR_BGR2RGB)
+
 def create_overlay(original_image: Image.Image, mask: np.ndarray) -> Image.Image:
     """
     Create colored overlay mask on original image.
@@ -24,29 +74,8 @@ def create_overlay(original_image: Image.Image, mask: np.ndarray) -> Image.Image
     Returns:
         PIL Image with overlay applied
     """
-    # Resize original image to match mask size for overlay
-    original_resized = original_image.resize((256, 256), Image.LANCZOS)
-    
-    # Convert mask to RGBA overlay
-    overlay = np.zeros((256, 256, 4), dtype=np.uint8)
-    
-    # Apply cancer color where mask == 1
-    cancer_indices = mask == 1
-    overlay[cancer_indices] = CANCER_COLOR
-    
-    # Create PIL Image from overlay
-    overlay_img = Image.fromarray(overlay, mode='RGBA')
-    
-    # Blend overlay with original image
-    result = original_resized.copy()
-    result = result.convert('RGBA')
-    result = Image.alpha_composite(result, overlay_img)
-    result = result.convert('RGB')
-    
-    # Resize back to original dimensions
-    final_result = result.resize(original_image.size, Image.LANCZOS)
-    
-    return final_result
+    # Upsample the mask once and blend at the original resolution (no resize round trip)
+    return _blend_mask_native(original_image, mask)
 
 def save_overlay(original_image: Image.Image, mask: np.ndarray, output_path: str):
     """
@@ -98,34 +127,13 @@ def create_gradcam_overlay(original_image: Image.Image, heatmap: np.ndarray, alp
     Returns:
         PIL Image with Grad-CAM overlay
     """
-    # Ensure heatmap is float32
-    heatmap = heatmap.astype(np.float32)
-
-    # If binary, make it smoother via distance transform
-    if heatmap.max() <= 1.0 and len(np.unique(heatmap)) <= 2:
-        if np.sum(heatmap) > 0:
-            inverse_mask = (1 - heatmap).astype(np.uint8)
-            distance = cv2.distanceTransform(inverse_mask, cv2.DIST_L2, 5)
-            distance_norm = distance / (np.max(distance) + 1e-6)
-            heatmap = 1.0 - distance_norm  # closer = hotter
-        else:
-            heatmap = np.zeros_like(heatmap, dtype=np.float32)
-
-    # Normalize to 0–1
-    heatmap = np.clip(heatmap, 0, 1)
-    if heatmap.max() > 0:
-        heatmap /= heatmap.max()
+    heatmap_color = _heatmap_colors(heatmap)
 
     # Resize to match image
     original_resized = np.array(original_image.resize((heatmap.shape[1], heatmap.shape[0]), Image.LANCZOS))
     if original_resized.dtype != np.uint8:
         original_resized = np.uint8(255 * np.clip(original_resized, 0, 1))
 
-    # Apply JET colormap
-    heatmap_uint8 = np.uint8(255 * heatmap)
-    heatmap_color = cv2.applyColorMap(heatmap_uint8, cv2.COLORMAP_JET)
-    heatmap_color = cv2.cvtColor(heatmap_color, cv2.COLOR_BGR2RGB)
-
     # Blend
     overlay = cv2.addWeighted(original_resized, 1 - alpha, heatmap_color, alpha, 0)
 
@@ -133,6 +141,28 @@ def create_gradcam_overlay(original_image: Image.Image, heatmap: np.ndarray, alp
     overlay_pil = Image.fromarray(overlay).resize(original_image.size, Image.LANCZOS)
     return overlay_pil
 
+def create_visualizations(
+    original_image: Image.Image,
+    mask: np.ndarray,
+    gradcam_alpha: float = 0.35
+) -> Tuple[Image.Image, Image.Image]:
+    """
+    Create the segmentation overlay and Grad-CAM overlay for one prediction.
+    
+    Same output as calling create_overlay and create_gradcam_overlay directly; the
+    overlay blends at the original resolution and the Grad-CAM at mask resolution,
+    so the two share no intermediate work.
+    
+    Args:
+        original_image: Original PIL Image
+        mask: Binary segmentation mask (256, 256) with values 0 or 1
+        gradcam_alpha: Grad-CAM overlay intensity
+        
+    Returns:
+        tuple: (overlay PIL Image, Grad-CAM PIL Image)
+    """
+    return create_overlay(original_image, mask), create_gradcam_overlay(original_image, mask, alpha=gradcam_alpha)
+
 def get_mask_statistics(mask: np.ndarray) -> dict:
     """
     Get statistics about the segmentation mask.
@@ -143,9 +173,10 @@ def get_mask_statistics(mask: np.ndarray) -> dict:
     Returns:
         Dictionary with statistics
     """
+    # Mask is binary, so one count_nonzero pass gives both classes without temporaries
     total_pixels = mask.size
-    cancer_pixels = np.sum(mask == 1)
-    background_pixels = np.sum(mask == 0)
+    cancer_pixels = np.count_nonzero(mask)
+    background_pixels = total_pixels - cancer_pixels
     
     return {
         "total_pixels": int(total_pixels),
@@ -6,7 +6,14 @@ Handles resizing, normalization, and tensor conversion.
 import numpy as np
 from PIL import Image
 import io
-from typing import Tuple
+import threading
+from typing import BinaryIO, Tuple, Union
+
+# Numba is optional; without it the tensor is packed with per-channel NumPy ufuncs
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
 # ImageNet mean and std for normalization
 IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
@@ -15,24 +22,69 @@ IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
 # Target model input size
 MODEL_INPUT_SIZE = 256
 
-def preprocess_image(image_bytes: bytes) -> Tuple[Image.Image, np.ndarray]:
+# (x / 255 - mean) / std folded into x * scale - bias, one pass per channel
+_SCALE = (1.0 / 255.0 / IMAGENET_STD).astype(np.float32)
+_BIAS = (IMAGENET_MEAN / IMAGENET_STD).astype(np.float32)
+
+# Per-thread NCHW input buffer for callers that opt into reuse
+_TLS = threading.local()
+
+# Both variants write (u8_hwc * scale - bias) into out_nchw[0] with the channels transposed
+if njit is not None:
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _pack(u8_hwc, scale, bias, out_nchw):
+        """Scale, shift and transpose every pixel in one fused parallel pass over rows."""
+        height, width, channels = u8_hwc.shape
+        for i in prange(height):
+            for j in range(width):
+                for c in range(channels):
+                    out_nchw[0, c, i, j] = u8_hwc[i, j, c] * scale[c] - bias[c]
+else:
+    def _pack(u8_hwc, scale, bias, out_nchw):
+        """Fill each channel plane with one multiply and one in-place subtract."""
+        for c in range(u8_hwc.shape[2]):
+            np.multiply(u8_hwc[:, :, c], scale[c], out=out_nchw[0, c], dtype=np.float32)
+            out_nchw[0, c] -= bias[c]
+
+def _input_buffer() -> np.ndarray:
+    """Return this thread's reusable (1, 3, 256, 256) float32 buffer."""
+    buffer = getattr(_TLS, 'nchw', None)
+    if buffer is None:
+        buffer = _TLS.nchw = np.empty((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+    return buffer
+
+def preprocess_image(
+    image_bytes: Union[bytes, BinaryIO],
+    reuse_buffer: bool = False
+) -> Tuple[Image.Image, np.ndarray]:
     """
     Preprocess image for model inference.
     
     Args:
-        image_bytes: Raw image bytes
+        image_bytes: Raw image bytes, or a binary file object positioned at the
+            start of the image (decoded directly without an extra copy)
+        reuse_buffer: Write the tensor into this thread's reusable buffer instead of
+            allocating one. The result is overwritten by the next reusing call on the
+            same thread, so only set this when the tensor is consumed (run through the
+            model) before then. The API leaves it off because its tensors wait in the
+            batcher queue while the worker thread preprocesses other uploads.
         
     Returns:
         tuple: (original PIL Image, preprocessed NCHW tensor)
     """
-    # Load image from bytes
+    # Load image from bytes or stream
     try:
-        image = Image.open(io.BytesIO(image_bytes))
+        if isinstance(image_bytes, (bytes, bytearray)):
+            image_bytes = io.BytesIO(image_bytes)
+        image = Image.open(image_bytes)
     except Exception as e:
         raise ValueError(f"Failed to load image: {e}")
     
-    # Convert RGBA to RGB if necessary
-    if image.mode in ('RGBA', 'LA', 'P'):
+    # Convert RGBA to RGB if necessary; a fully opaque alpha channel (common for
+    # screenshots) is simply dropped instead of compositing onto white
+    if image.mode in ('RGBA', 'LA') and image.getchannel('A').getextrema()[0] == 255:
+        image = image.convert('RGB')
+    elif image.mode in ('RGBA', 'LA', 'P'):
         background = Image.new('RGB', image.size, (255, 255, 255))
         if image.mode == 'P':
             image = image.convert('RGBA')
@@ -41,32 +93,30 @@ def preprocess_image(image_bytes: bytes) -> Tuple[Image.Image, np.ndarray]:
     elif image.mode != 'RGB':
         image = image.convert('RGB')
     
-    # Store original for overlay
-    original_image = image.copy()
-    
-    # Resize to model input size
-    image = image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.LANCZOS)
-    
-    # Convert to numpy array
-    img_array = np.array(image, dtype=np.float32) / 255.0  # Normalize to [0, 1]
-    
-    # Apply ImageNet normalization
-    img_array = (img_array - IMAGENET_MEAN) / IMAGENET_STD
+    # Keep the full-resolution image for the overlay; resize returns a new image and
+    # leaves this one untouched, so no defensive copy is needed
+    original_image = image
     
-    # Convert HWC to CHW format
-    img_array = img_array.transpose(2, 0, 1)  # (256, 256, 3) -> (3, 256, 256)
+    # Resize to model input size; bilinear matches the training T.Resize and is
+    # much cheaper than LANCZOS
+    image = image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.BILINEAR)
     
-    # Add batch dimension: NCHW
-    img_array = np.expand_dims(img_array, axis=0)  # (3, 256, 256) -> (1, 3, 256, 256)
+    # Normalize the HWC pixels straight into an NCHW buffer in one pass
+    if reuse_buffer:
+        img_array = _input_buffer()
+    else:
+        img_array = np.empty((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+    _pack(np.asarray(image, dtype=np.uint8), _SCALE, _BIAS, img_array)
     
     return original_image, img_array
 
-def preprocess_file(image_path: str) -> Tuple[Image.Image, np.ndarray]:
+def preprocess_file(image_path: str, reuse_buffer: bool = False) -> Tuple[Image.Image, np.ndarray]:
     """
     Preprocess image from file path.
     
     Args:
         image_path: Path to image file
+        reuse_buffer: See preprocess_image
         
     Returns:
         tuple: (original PIL Image, preprocessed NCHW tensor)
@@ -74,5 +124,5 @@ def preprocess_file(image_path: str) -> Tuple[Image.Image, np.ndarray]:
     with open(image_path, 'rb') as f:
         image_bytes = f.read()
     
-    return preprocess_image(image_bytes)
+    return preprocess_image(image_bytes, reuse_buffer=reuse_buffer)
 
@@ -0,0 +1,199 @@
+"""
+Build-time INT8 quantization of the CRC segmentation ONNX model.
+Calibrates activations on preprocessed colonoscopy images, checks the INT8 masks
+against the float32 masks on held-out images, and only then writes
+crc_segmentation.int8.onnx next to the float model, which CRCSegmentationModel
+loads in preference to the float32 graph on CPU. Optionally also writes an
+FP16 copy (crc_segmentation.fp16.onnx) for GPU inference.
+
+Usage:
+    python quantize_model.py --images data/kvasir_seg/images --samples 100 \
+        [--eval-samples 50] [--min-dice 0.98] [--fp16]
+"""
+
+import argparse
+import os
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+from preprocessing import preprocess_file
+
+MODEL_DIR = Path(__file__).resolve().parent / "model"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+# Minimum mean Dice between INT8 and float32 masks on held-out images; below it the
+# INT8 model is not written
+DEFAULT_MIN_DICE = 0.98
+
+
+class ColonoscopyCalibrationReader(CalibrationDataReader):
+    """Feeds preprocessed images to the calibrator one NCHW tensor at a time."""
+
+    def __init__(self, input_name: str, image_paths: List[Path]):
+        """
+        Initialize the calibration reader.
+
+        Args:
+            input_name: Name of the model input
+            image_paths: Images used to collect activation ranges
+        """
+        self.input_name = input_name
+        self.image_paths = image_paths
+        self._iterator = self._tensors()
+
+    def _tensors(self) -> Iterator[dict]:
+        for path in self.image_paths:
+            # The calibrator runs each tensor before asking for the next, so one buffer serves all
+            _, tensor = preprocess_file(str(path), reuse_buffer=True)
+            yield {self.input_name: tensor}
+
+    def get_next(self):
+        return next(self._iterator, None)
+
+    def rewind(self):
+        self._iterator = self._tensors()
+
+
+def _masks(session, tensors: List[np.ndarray]) -> List[np.ndarray]:
+    """Binary masks as CRCSegmentationModel produces them (0.5 threshold, or argmax)."""
+    input_name = session.get_inputs()[0].name
+    masks = []
+    for tensor in tensors:
+        prediction = session.run(None, {input_name: tensor})[0]
+        if prediction.shape[1] == 1:
+            masks.append(prediction[0, 0] > 0.5)
+        else:
+            masks.append(np.argmax(prediction[0], axis=0) > 0)
+    return masks
+
+
+def compare_masks(model_path: Path, quantized_path: Path, image_paths: List[Path]) -> Tuple[float, float]:
+    """
+    Agreement between the float32 and INT8 models' masks, both run on CPU.
+
+    Args:
+        model_path: Float32 ONNX model
+        quantized_path: INT8 ONNX model
+        image_paths: Held-out images (not used for calibration)
+
+    Returns:
+        tuple: (mean Dice, mean IoU) of the INT8 masks against the float32 masks
+    """
+    import onnxruntime as ort
+
+    tensors = [preprocess_file(str(path))[1] for path in image_paths]
+    reference = _masks(ort.InferenceSession(str(model_path), providers=['CPUExecutionProvider']), tensors)
+    quantized = _masks(ort.InferenceSession(str(quantized_path), providers=['CPUExecutionProvider']), tensors)
+
+    dice_scores, iou_scores = [], []
+    for ref, quant in zip(reference, quantized):
+        intersection = np.count_nonzero(ref & quant)
+        total = np.count_nonzero(ref) + np.count_nonzero(quant)
+        # Two empty masks agree perfectly
+        dice_scores.append(2.0 * intersection / total if total else 1.0)
+        iou_scores.append(intersection / (total - intersection) if total else 1.0)
+    return float(np.mean(dice_scores)), float(np.mean(iou_scores))
+
+
+def quantize_model(model_path: Path, output_path: Path, image_dir: Path, samples: int = 100,
+                   eval_samples: int = 50, min_dice: float = DEFAULT_MIN_DICE):
+    """
+    Statically quantize the model to INT8 (QDQ format, per-channel weights).
+
+    The INT8 model is written to output_path only if its masks on held-out images
+    reach min_dice mean Dice against the float32 masks.
+
+    Args:
+        model_path: Float32 ONNX model
+        output_path: Where to write the INT8 model
+        image_dir: Directory of calibration images
+        samples: Number of calibration images
+        eval_samples: Number of held-out images (after the calibration ones) to validate on
+        min_dice: Minimum mean Dice between INT8 and float32 masks
+
+    Raises:
+        ValueError: If the INT8 masks fall below min_dice
+    """
+    import onnxruntime as ort
+
+    image_paths = sorted(
+        Path(entry.path) for entry in os.scandir(image_dir)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    calibration_paths = image_paths[:samples]
+    eval_paths = image_paths[samples:samples + eval_samples]
+    if not calibration_paths:
+        raise FileNotFoundError(f"No calibration images found in: {image_dir}")
+    if not eval_paths:
+        raise FileNotFoundError(
+            f"No held-out images left in {image_dir} after {len(calibration_paths)} calibration images"
+        )
+
+    input_name = ort.InferenceSession(str(model_path), providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = ColonoscopyCalibrationReader(input_name, calibration_paths)
+
+    # Quantize to a temporary file so a rejected model never replaces (or becomes) the one
+    # CRCSegmentationModel picks up
+    tmp_path = output_path.with_suffix(f".{os.getpid()}.tmp")
+    print(f"Calibrating on {len(calibration_paths)} images from {image_dir}")
+    try:
+        quantize_static(
+            str(model_path),
+            str(tmp_path),
+            reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+
+        dice, iou = compare_masks(model_path, tmp_path, eval_paths)
+        print(f"INT8 vs float32 on {len(eval_paths)} held-out images: Dice {dice:.4f}, IoU {iou:.4f}")
+        if dice < min_dice:
+            raise ValueError(
+                f"INT8 masks diverge from float32 (mean Dice {dice:.4f} < {min_dice}); "
+                f"not writing {output_path}"
+            )
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    print(f"✅ INT8 model saved to: {output_path}")
+
+
+def convert_fp16(model_path: Path, output_path: Path):
+    """
+    Convert the model weights and compute to FP16, keeping float32 inputs/outputs
+    so preprocessing and mask thresholding are unchanged.
+
+    Args:
+        model_path: Float32 ONNX model
+        output_path: Where to write the FP16 model
+    """
+    import onnx
+    from onnxconverter_common import float16
+
+    model_fp16 = float16.convert_float_to_float16(onnx.load(str(model_path)), keep_io_types=True)
+    onnx.save(model_fp16, str(output_path))
+    print(f"✅ FP16 model saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the CRC segmentation model to INT8")
+    parser.add_argument("--model", type=Path, default=MODEL_DIR / "crc_segmentation.onnx")
+    parser.add_argument("--output", type=Path, default=MODEL_DIR / "crc_segmentation.int8.onnx")
+    parser.add_argument("--images", type=Path, default=Path("data/kvasir_seg/images"))
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--eval-samples", type=int, default=50,
+                        help="Held-out images (after the calibration ones) to compare INT8 and float32 masks on")
+    parser.add_argument("--min-dice", type=float, default=DEFAULT_MIN_DICE,
+                        help="Minimum mean Dice of INT8 masks against float32 masks")
+    parser.add_argument("--fp16", action="store_true", help="Also write crc_segmentation.fp16.onnx")
+    args = parser.parse_args()
+
+    quantize_model(args.model, args.output, args.images, args.samples, args.eval_samples, args.min_dice)
+    if args.fp16:
+        convert_fp16(args.model, MODEL_DIR / "crc_segmentation.fp16.onnx")
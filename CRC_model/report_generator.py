@@ -15,48 +15,105 @@ from pathlib import Path
 import io
 import base64
 import numpy as np
+from typing import Union
+
+
+def _build_styles():
+    """Build the sample stylesheet plus the report's custom paragraph styles."""
+    styles = getSampleStyleSheet()
+    
+    # Title style
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Section header
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#2563eb'),
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Risk level style
+    styles.add(ParagraphStyle(
+        name='RiskLevel',
+        parent=styles['Normal'],
+        fontSize=14,
+        spaceAfter=6,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Image titles and captions
+    styles.add(ParagraphStyle(
+        name='CenterBold',
+        parent=styles['Normal'],
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    styles.add(ParagraphStyle(
+        name='CenterBoldLarge',
+        parent=styles['CenterBold'],
+        fontSize=11
+    ))
+    styles.add(ParagraphStyle(
+        name='CenterSmall',
+        parent=styles['Normal'],
+        fontSize=8,
+        alignment=TA_CENTER,
+        textColor=colors.HexColor('#6b7280')
+    ))
+    styles.add(ParagraphStyle(
+        name='CenterSmallAlert',
+        parent=styles['CenterSmall'],
+        textColor=colors.HexColor('#ef4444')
+    ))
+    styles.add(ParagraphStyle(
+        name='HeatmapLegend',
+        parent=styles['Normal'],
+        fontSize=9,
+        alignment=TA_CENTER,
+        textColor=colors.HexColor('#374151')
+    ))
+    
+    # Disclaimer and footer
+    styles.add(ParagraphStyle(
+        name='Disclaimer',
+        parent=styles['Normal'],
+        fontSize=7,
+        textColor=colors.HexColor('#6b7280'),
+        alignment=TA_JUSTIFY
+    ))
+    styles.add(ParagraphStyle(
+        name='Footer',
+        parent=styles['Normal'],
+        fontSize=7,
+        textColor=colors.HexColor('#9ca3af'),
+        alignment=TA_CENTER
+    ))
+    
+    return styles
+
+
+# Built once at import; the styles are never mutated, so all reports share them
+_STYLES = _build_styles()
 
 
 class CRCReportGenerator:
     """Generate comprehensive PDF reports for CRC segmentation analysis."""
-    
+
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-    
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles."""
-        # Title style
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Section header
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#2563eb'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Risk level style
-        self.styles.add(ParagraphStyle(
-            name='RiskLevel',
-            parent=self.styles['Normal'],
-            fontSize=14,
-            spaceAfter=6,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
+        self.styles = _STYLES
     
     def _get_risk_color(self, risk_level: str):
         """Get color based on risk level."""
@@ -68,34 +125,43 @@ class CRCReportGenerator:
         }
         return risk_colors.get(risk_level, colors.grey)
     
-    def _decode_base64_image(self, base64_string: str, max_width: float = 4.5*inch) -> Image:
-        """Decode base64 image and prepare for PDF."""
-        # Remove data URL prefix if present
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        # Decode base64
-        image_data = base64.b64decode(base64_string)
-        
-        # Load with PIL
-        pil_image = PILImage.open(io.BytesIO(image_data))
-        
-        # Save to temporary buffer
-        img_buffer = io.BytesIO()
-        pil_image.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
+    def _decode_base64_image(self, image: Union[str, bytes], max_width: float = 4.5*inch) -> Image:
+        """Decode a base64 image (or take raw encoded image bytes) and prepare for PDF."""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            # In-process callers hand over the encoded file directly, no base64 round trip
+            image_data = image
+        else:
+            # Remove data URL prefix if present (the comma can only appear in the short header)
+            comma = image.find(',', 0, 128)
+            payload = image[comma + 1:] if comma != -1 else image
+            
+            # Decode base64
+            image_data = base64.b64decode(payload, validate=False)
+        
+        # Open lazily with PIL (only the header is parsed to get the size)
+        img_buffer = io.BytesIO(image_data)
+        pil_image = PILImage.open(img_buffer)
+        width, height = pil_image.size
+        
+        # ReportLab embeds PNG/JPEG bytes as-is; re-encode anything else (e.g. WebP) to PNG
+        if pil_image.format in ('PNG', 'JPEG'):
+            img_buffer.seek(0)
+        else:
+            img_buffer = io.BytesIO()
+            pil_image.save(img_buffer, format='PNG')
+            img_buffer.seek(0)
         
         # Create ReportLab image with aspect ratio
-        img = Image(img_buffer, width=max_width, height=max_width * pil_image.height / pil_image.width)
+        img = Image(img_buffer, width=max_width, height=max_width * height / width)
         return img
     
     def generate_report(
         self,
         output_path: str,
         filename: str,
-        original_image: str,
-        overlay_image: str,
-        heatmap_image: str,
+        original_image: Union[str, bytes],
+        overlay_image: Union[str, bytes],
+        heatmap_image: Union[str, bytes],
         statistics: dict,
         risk_level: str,
         confidence: float,
@@ -107,9 +173,9 @@ class CRCReportGenerator:
         Args:
             output_path: Directory to save PDF
             filename: Original filename
-            original_image: Base64 encoded original image
-            overlay_image: Base64 encoded overlay
-            heatmap_image: Base64 encoded heatmap
+            original_image: Base64 encoded original image, or its encoded file bytes
+            overlay_image: Base64 encoded overlay, or its encoded file bytes
+            heatmap_image: Base64 encoded heatmap, or its encoded file bytes
             statistics: Segmentation statistics
             risk_level: Risk assessment level
             confidence: Model confidence
@@ -122,8 +188,16 @@ class CRCReportGenerator:
         output_dir = Path(output_path)
         output_dir.mkdir(parents=True, exist_ok=True)
         
+        # Capture the report time once for the filename, header and footer
+        now = datetime.now()
+        
+        # Read the statistics once; they are interpolated throughout the report
+        cancer_percentage = float(statistics.get('cancer_percentage', 0))
+        cancer_pixels = int(statistics.get('cancer_pixels', 0))
+        total_pixels = int(statistics.get('total_pixels', 0))
+        
         # Generate PDF filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         pdf_filename = f"CRC_Report_{Path(filename).stem}_{timestamp}.pdf"
         pdf_path = output_dir / pdf_filename
         
@@ -150,7 +224,7 @@ class CRCReportGenerator:
         
         # Report metadata
         metadata = [
-            ['Report Date:', datetime.now().strftime("%B %d, %Y %I:%M %p")],
+            ['Report Date:', now.strftime("%B %d, %Y %I:%M %p")],
             ['Image File:', filename],
             ['Analysis Type:', 'Binary Segmentation (ONNX Model)']
         ]
@@ -174,10 +248,10 @@ class CRCReportGenerator:
                 f'<font color="{risk_color.hexval()}" size="14"><b>{risk_level}</b></font>',
                 self.styles['Normal']
             )],
-            ['Polyp Coverage:', f"{statistics.get('cancer_percentage', 0):.2f}%"],
+            ['Polyp Coverage:', f"{cancer_percentage:.2f}%"],
             ['Model Confidence:', f"{confidence * 100:.1f}%"],
-            ['Detected Pixels:', f"{statistics.get('cancer_pixels', 0):,}"],
-            ['Total Pixels:', f"{statistics.get('total_pixels', 0):,}"]
+            ['Detected Pixels:', f"{cancer_pixels:,}"],
+            ['Total Pixels:', f"{total_pixels:,}"]
         ]
         
         risk_table = Table(risk_data, colWidths=[2*inch, 4*inch])
@@ -230,22 +304,16 @@ class CRCReportGenerator:
             image_comparison_data = [
                 [
                     Paragraph("<b>Original Colonoscopy Image</b>", 
-                             ParagraphStyle('CenterBold', parent=self.styles['Normal'], 
-                                          alignment=TA_CENTER, fontName='Helvetica-Bold')),
+                             self.styles['CenterBold']),
                     Paragraph("<b>AI Segmentation Result</b>", 
-                             ParagraphStyle('CenterBold', parent=self.styles['Normal'], 
-                                          alignment=TA_CENTER, fontName='Helvetica-Bold'))
+                             self.styles['CenterBold'])
                 ],
                 [orig_img, overlay_img],
                 [
                     Paragraph("Unprocessed colonoscopy image", 
-                             ParagraphStyle('CenterSmall', parent=self.styles['Normal'], 
-                                          fontSize=8, alignment=TA_CENTER, 
-                                          textColor=colors.HexColor('#6b7280'))),
+                             self.styles['CenterSmall']),
                     Paragraph("Red areas = Detected polyps", 
-                             ParagraphStyle('CenterSmall', parent=self.styles['Normal'], 
-                                          fontSize=8, alignment=TA_CENTER, 
-                                          textColor=colors.HexColor('#ef4444')))
+                             self.styles['CenterSmallAlert'])
                 ]
             ]
             
@@ -281,8 +349,8 @@ class CRCReportGenerator:
             ],
             [
                 'Coverage Area',
-                f'{statistics.get("cancer_pixels", 0):,} pixels detected\n'
-                f'({statistics.get("cancer_percentage", 0):.2f}% of image)',
+                f'{cancer_pixels:,} pixels detected\n'
+                f'({cancer_percentage:.2f}% of image)',
                 'Quantifies polyp size\nrelative to field of view'
             ],
             [
@@ -326,14 +394,12 @@ class CRCReportGenerator:
             # Center the heatmap in a styled container
             heatmap_data = [
                 [Paragraph("<b>Model Attention Visualization</b>", 
-                          ParagraphStyle('CenterBold', parent=self.styles['Normal'], 
-                                       alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=11))],
+                          self.styles['CenterBoldLarge'])],
                 [heatmap_img],
                 [Paragraph(
                     "<font color='red'><b>Red:</b></font> Detected polyp regions (high confidence) | "
                     "<font color='green'><b>Green:</b></font> Normal tissue (low risk)",
-                    ParagraphStyle('CenterSmall', parent=self.styles['Normal'], 
-                                 fontSize=9, alignment=TA_CENTER, textColor=colors.HexColor('#374151'))
+                    self.styles['HeatmapLegend']
                 )]
             ]
             
@@ -399,12 +465,12 @@ class CRCReportGenerator:
         # Key Findings Summary
         key_findings = [
             ['Parameter', 'Value', 'Status'],
-            ['Polyp Coverage', f"{statistics.get('cancer_percentage', 0):.2f}%", 
-             'High' if statistics.get('cancer_percentage', 0) > 2 else 
-             'Medium' if statistics.get('cancer_percentage', 0) > 0.5 else 'Low'],
-            ['Total Pixels Analyzed', f"{statistics.get('total_pixels', 0):,}", 'Complete'],
-            ['Abnormal Pixels', f"{statistics.get('cancer_pixels', 0):,}", 
-             'Detected' if statistics.get('cancer_pixels', 0) > 0 else 'None'],
+            ['Polyp Coverage', f"{cancer_percentage:.2f}%", 
+             'High' if cancer_percentage > 2 else 
+             'Medium' if cancer_percentage > 0.5 else 'Low'],
+            ['Total Pixels Analyzed', f"{total_pixels:,}", 'Complete'],
+            ['Abnormal Pixels', f"{cancer_pixels:,}", 
+             'Detected' if cancer_pixels > 0 else 'None'],
             ['Model Confidence', f"{confidence * 100:.1f}%", 
              'High' if confidence > 0.8 else 'Moderate'],
             ['Risk Classification', risk_level, 
@@ -460,26 +526,14 @@ class CRCReportGenerator:
             "does not constitute medical advice, diagnosis, or treatment recommendations. The AI model "
             "has been trained on medical imaging data but may not capture all clinical nuances. "
             "Always consult with healthcare professionals for proper medical guidance.",
-            ParagraphStyle(
-                'Disclaimer',
-                parent=self.styles['Normal'],
-                fontSize=7,
-                textColor=colors.HexColor('#6b7280'),
-                alignment=TA_JUSTIFY
-            )
+            self.styles['Disclaimer']
         ))
         
         story.append(Spacer(1, 0.2*inch))
         story.append(Paragraph(
-            f"<b>Report Generated:</b> {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | "
+            f"<b>Report Generated:</b> {now.strftime('%B %d, %Y at %I:%M %p')} | "
             f"<b>ColoVision AI v1.0</b>",
-            ParagraphStyle(
-                'Footer',
-                parent=self.styles['Normal'],
-                fontSize=7,
-                textColor=colors.HexColor('#9ca3af'),
-                alignment=TA_CENTER
-            )
+            self.styles['Footer']
         ))
         
         # Build PDF
@@ -490,9 +544,9 @@ class CRCReportGenerator:
 
 def create_report(
     filename: str,
-    original_image: str,
-    overlay_image: str,
-    heatmap_image: str,
+    original_image: Union[str, bytes],
+    overlay_image: Union[str, bytes],
+    heatmap_image: Union[str, bytes],
     statistics: dict,
     risk_level: str,
     confidence: float,
@@ -0,0 +1,119 @@
+"""
+Regression set for the colonoscopy image validation heuristics.
+
+Kvasir frames can't ship with the repo, so the set is synthetic: reddish, vignetted
+frames that pass every color/vignette check and differ only in their center texture.
+Positives carry smooth tissue-like texture; negatives carry the dense high-contrast
+strokes of text and UI screenshots. Verdicts are pinned so threshold or metric changes
+that flip them fail here.
+"""
+
+import numpy as np
+import cv2
+import pytest
+from PIL import Image
+
+from image_validation import _center_edge_strength, validate_colonoscopy_image
+
+EDGE_REASON = "color mismatch (too many sharp edges, likely not a colonoscopy image)"
+TISSUE_RGB = np.array([200, 90, 80], dtype=np.float32)
+STROKE_RGB = np.array([235, 130, 120], dtype=np.float32)
+BACKGROUND_RGB = np.array([90, 25, 25], dtype=np.float32)
+
+
+def _vignette(height, width):
+    """Radial falloff from a bright center to dark edges."""
+    y, x = np.mgrid[0:height, 0:width]
+    radius = np.hypot((x - width / 2) / (width / 2), (y - height / 2) / (height / 2))
+    return np.clip(1.1 - 0.75 * radius, 0.15, 1.0)[..., None]
+
+
+def _to_image(pixels):
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def tissue_frame(height, width, noise=4.0, seed=0):
+    """Low-frequency texture that scales with the frame, plus mild sensor noise."""
+    rng = np.random.default_rng(seed)
+    texture = rng.normal(0, 1, (12, 15, 3)).astype(np.float32)
+    texture = cv2.resize(texture, (width, height), interpolation=cv2.INTER_CUBIC) * 25
+    pixels = (TISSUE_RGB + texture) * _vignette(height, width)
+    return _to_image(pixels + rng.normal(0, noise, (height, width, 3)))
+
+
+def noise_frame(height, width, sigma=50.0, seed=0):
+    """Unblurred per-channel Gaussian noise over a plain tissue color."""
+    rng = np.random.default_rng(seed)
+    pixels = TISSUE_RGB * _vignette(height, width)
+    return _to_image(pixels + rng.normal(0, sigma, (height, width, 3)))
+
+
+def screenshot_frame(height, width, stroke=1, seed=0):
+    """Random glyph-like strokes `stroke` pixels wide on a dark red UI background."""
+    rng = np.random.default_rng(seed)
+    glyphs = rng.random((height // stroke, width // stroke)) < 0.5
+    pixels = np.where(glyphs[..., None], STROKE_RGB, BACKGROUND_RGB)
+    pixels = np.kron(pixels, np.ones((stroke, stroke, 1)))
+    return _to_image(pixels * _vignette(height, width))
+
+
+POSITIVES = {
+    "tissue_576x720": lambda: tissue_frame(576, 720),
+    "tissue_1080x1920": lambda: tissue_frame(1080, 1920, seed=1),
+    "tissue_300x300": lambda: tissue_frame(300, 300, seed=2),
+    "tissue_noisy_576x720": lambda: tissue_frame(576, 720, noise=15.0, seed=3),
+    "tissue_noisy_1080x1920": lambda: tissue_frame(1080, 1920, noise=15.0, seed=4),
+    # Score about 30.5 against the threshold of 35; a luma gray reads them ~15% higher
+    "noise_sigma50_576x720": lambda: noise_frame(576, 720),
+    "noise_sigma50_480x640": lambda: noise_frame(480, 640, seed=1),
+}
+
+NEGATIVES = {
+    "screenshot_576x720": lambda: screenshot_frame(576, 720),
+    "screenshot_480x640": lambda: screenshot_frame(480, 640, seed=1),
+    # The same screens at 2x and 3x pixel density (strokes scale with the upload)
+    "screenshot_1152x1440": lambda: screenshot_frame(1152, 1440, stroke=2),
+    "screenshot_1728x2160": lambda: screenshot_frame(1728, 2160, stroke=3),
+}
+
+
+@pytest.mark.parametrize("name", sorted(POSITIVES))
+def test_positive_frames_pass(name):
+    assert validate_colonoscopy_image(POSITIVES[name]()) == (True, "validation passed")
+
+
+@pytest.mark.parametrize("name", sorted(NEGATIVES))
+def test_screenshot_frames_rejected_for_edges(name):
+    assert validate_colonoscopy_image(NEGATIVES[name]()) == (False, EDGE_REASON)
+
+
+def _reference_edge_strength(image):
+    """The original float implementation: channel-mean gray, mean |np.diff| on both axes."""
+    width, height = image.size
+    pixels = np.array(image, dtype=np.float32)
+    center = pixels[int(height * 0.3):int(height * 0.7), int(width * 0.3):int(width * 0.7)]
+    center_gray = center.sum(axis=2) / 3.0
+    h_diff = np.abs(np.diff(center_gray, axis=0))
+    v_diff = np.abs(np.diff(center_gray, axis=1))
+    return (np.mean(h_diff) + np.mean(v_diff)) / 2.0
+
+
+# Frames no larger than 720x576, which the edge check measures at native resolution
+NATIVE_SCALE_FRAMES = [
+    "tissue_576x720", "tissue_300x300", "tissue_noisy_576x720",
+    "noise_sigma50_576x720", "noise_sigma50_480x640",
+    "screenshot_576x720", "screenshot_480x640",
+]
+
+
+@pytest.mark.parametrize("name", NATIVE_SCALE_FRAMES)
+def test_edge_strength_matches_reference_up_to_720x576(name):
+    image = {**POSITIVES, **NEGATIVES}[name]()
+    assert _center_edge_strength(image) == pytest.approx(_reference_edge_strength(image), rel=1e-5)
+
+
+@pytest.mark.parametrize("factor", [2, 3])
+def test_edge_strength_is_independent_of_upload_size(factor):
+    image = screenshot_frame(576, 720)
+    upscaled = image.resize((720 * factor, 576 * factor), Image.NEAREST)
+    assert _center_edge_strength(upscaled) == pytest.approx(_center_edge_strength(image), rel=0.05)
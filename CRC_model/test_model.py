@@ -4,11 +4,25 @@ Quick test script to inspect the ONNX model structure and compatibility.
 
 import onnxruntime as ort
 import numpy as np
+import argparse
+import time
 from pathlib import Path
 
-def test_onnx_model():
+# Model files per precision (FP16/INT8 are built by quantize_model.py)
+MODEL_VARIANTS = {
+    "fp32": "crc_segmentation.onnx",
+    "fp16": "crc_segmentation.fp16.onnx",
+    "int8": "crc_segmentation.int8.onnx",
+}
+
+def test_onnx_model(precision: str = "fp16"):
     """Test the ONNX model structure and compatibility."""
-    model_path = Path(__file__).resolve().parent / "model" / "crc_segmentation.onnx"
+    model_dir = Path(__file__).resolve().parent / "model"
+    model_path = model_dir / MODEL_VARIANTS[precision]
+    
+    if precision != "fp32" and not model_path.exists():
+        print(f" {precision} model not built (run quantize_model.py), falling back to fp32")
+        model_path = model_dir / MODEL_VARIANTS["fp32"]
     
     if not model_path.exists():
         print(f" Model not found at: {model_path}")
@@ -18,9 +32,21 @@ def test_onnx_model():
     print(f"   File size: {model_path.stat().st_size / (1024*1024):.2f} MB")
     print()
     
-    # Load the model
+    # Load the model, preferring TensorRT (FP16, cached engines), then CUDA, then CPU;
+    # providers that aren't installed are skipped by ONNX Runtime
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    providers = [
+        ('TensorrtExecutionProvider', {
+            'trt_fp16_enable': True,
+            'trt_engine_cache_enable': True,
+            'trt_engine_cache_path': str(model_path.parent / "trt_cache"),
+        }),
+        'CUDAExecutionProvider',
+        'CPUExecutionProvider',
+    ]
     try:
-        session = ort.InferenceSession(str(model_path))
+        session = ort.InferenceSession(str(model_path), sess_options=sess_options, providers=providers)
         print(" Model loaded successfully")
     except Exception as e:
         print(f" Failed to load model: {e}")
@@ -55,7 +81,24 @@ def test_onnx_model():
     print(f"  Sample input shape: {sample_input.shape}")
     
     try:
-        outputs = session.run(None, {input_name: sample_input})
+        # Bind the input once on the session's device so the run doesn't copy it host-to-device
+        device = 'cpu' if session.get_providers()[0] == 'CPUExecutionProvider' else 'cuda'
+        io_binding = session.io_binding()
+        input_ort = ort.OrtValue.ortvalue_from_numpy(sample_input, device, 0)
+        io_binding.bind_ortvalue_input(input_name, input_ort)
+        for output_info in session.get_outputs():
+            io_binding.bind_output(output_info.name, device)
+        session.run_with_iobinding(io_binding)
+        outputs = io_binding.copy_outputs_to_cpu()
+        
+        # Preallocate persistent device outputs with the now-known shapes, so repeated runs
+        # write into the same buffers instead of allocating new ones
+        output_orts = [
+            ort.OrtValue.ortvalue_from_shape_and_type(list(output.shape), output.dtype, device, 0)
+            for output in outputs
+        ]
+        for output_info, output_ort in zip(session.get_outputs(), output_orts):
+            io_binding.bind_ortvalue_output(output_info.name, output_ort)
         print(f"  Inference successful!")
         print(f"  Number of outputs: {len(outputs)}")
         
@@ -63,9 +106,118 @@ def test_onnx_model():
             print(f"  Output {idx} shape: {output.shape}")
             print(f"  Output {idx} dtype: {output.dtype}")
             print(f"  Output {idx} value range: [{output.min():.4f}, {output.max():.4f}]")
+        
+        # Average latency over repeated runs with the same binding; each new frame is
+        # copied into the bound input buffer in place
+        runs = 20
+        frames = np.random.randn(runs, *sample_input.shape).astype(np.float32)
+        start = time.perf_counter()
+        for frame in frames:
+            input_ort.update_inplace(frame)
+            session.run_with_iobinding(io_binding)
+        latency_ms = (time.perf_counter() - start) / runs * 1000
+        print(f"  Average latency ({model_path.name}, {runs} runs): {latency_ms:.2f} ms")
+        
+        benchmark_batch_sizes(session, device, runs=runs)
     except Exception as e:
         print(f"   Inference failed: {e}")
 
+def benchmark_batch_sizes(session, device: str, batch_sizes=(1, 4, 8, 16), runs: int = 20):
+    """
+    Measure median latency and throughput at the batch sizes the API serves.
+    
+    Args:
+        session: Loaded ONNX Runtime session
+        device: 'cpu' or 'cuda', where inputs/outputs are bound
+        batch_sizes: Batch sizes to run (a fixed-batch model only runs its own)
+        runs: Number of timed runs per batch size
+    """
+    input_info = session.get_inputs()[0]
+    fixed_batch = input_info.shape[0] if isinstance(input_info.shape[0], int) else None
+    
+    print("\n Batch Throughput:")
+    for batch_size in batch_sizes:
+        if fixed_batch is not None and batch_size != fixed_batch:
+            print(f"  bs={batch_size}: skipped (model has fixed batch {fixed_batch})")
+            continue
+        
+        batch = np.random.randn(batch_size, 3, 256, 256).astype(np.float32)
+        io_binding = session.io_binding()
+        io_binding.bind_ortvalue_input(input_info.name, ort.OrtValue.ortvalue_from_numpy(batch, device, 0))
+        for output_info in session.get_outputs():
+            io_binding.bind_output(output_info.name, device)
+        
+        # Warmup (TensorRT builds an engine profile for each new shape)
+        for _ in range(3):
+            session.run_with_iobinding(io_binding)
+        
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            session.run_with_iobinding(io_binding)
+            timings.append(time.perf_counter() - start)
+        median_s = float(np.median(timings))
+        
+        # An all-zero range here flags an engine profile that doesn't cover this batch size
+        output = io_binding.copy_outputs_to_cpu()[0]
+        print(f"  bs={batch_size}: {median_s * 1000:.2f} ms, throughput {batch_size / median_s:.1f} img/s, "
+              f"output range [{output.min():.4f}, {output.max():.4f}]")
+
+def benchmark_torch_cuda_graph(checkpoint_path: str, runs: int = 20):
+    """
+    Benchmark the PyTorch UNetEffNet with CUDA Graph capture/replay.
+    
+    Args:
+        checkpoint_path: Trained state_dict (e.g. best_model.pth from training/train.py)
+        runs: Number of timed replays
+    """
+    import torch
+    from model.unet_effnet import UNetEffNet
+    
+    print("\n PyTorch CUDA Graph Benchmark:")
+    if not torch.cuda.is_available():
+        print("  Skipped: CUDA is not available")
+        return
+    
+    model = UNetEffNet(backbone_name="efficientnet_b0", num_classes=1, pretrained=False, apply_sigmoid=True)
+    model.load_state_dict(torch.load(checkpoint_path, map_location="cpu"))
+    model = model.eval().fuse_conv_bn().cuda()
+    
+    with torch.inference_mode():
+        # Warm up on a side stream (cuDNN algorithm selection, allocator) before capture
+        static_in = torch.zeros(1, 3, 256, 256, device="cuda")
+        side_stream = torch.cuda.Stream()
+        side_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(side_stream):
+            for _ in range(3):
+                model(static_in)
+        torch.cuda.current_stream().wait_stream(side_stream)
+        
+        # Capture once; each replay is a single launch for the whole forward pass
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_out = model(static_in)
+        
+        frames = torch.randn(runs, 1, 3, 256, 256).pin_memory()
+        torch.cuda.synchronize()
+        start = time.perf_counter()
+        for frame in frames:
+            static_in.copy_(frame, non_blocking=True)
+            graph.replay()
+            result = static_out
+        torch.cuda.synchronize()
+        latency_ms = (time.perf_counter() - start) / runs * 1000
+    
+    print(f"  Output shape: {tuple(result.shape)}")
+    print(f"  Average latency (CUDA graph, {runs} runs): {latency_ms:.2f} ms")
+
 if __name__ == "__main__":
-    test_onnx_model()
+    parser = argparse.ArgumentParser(description="Inspect and benchmark the CRC segmentation ONNX model")
+    parser.add_argument("--precision", choices=sorted(MODEL_VARIANTS), default="fp16")
+    parser.add_argument("--torch-checkpoint", help="Also benchmark this PyTorch checkpoint with CUDA graphs")
+    args = parser.parse_args()
+    
+    test_onnx_model(args.precision)
+    if args.torch_checkpoint:
+        benchmark_torch_cuda_graph(args.torch_checkpoint)
 
@@ -0,0 +1,23 @@
+"""
+Checks that the fused visualization entry point matches the public overlay functions
+that /segment and /generate-report are documented against.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from postprocessing import create_gradcam_overlay, create_overlay, create_visualizations
+
+
+@pytest.mark.parametrize("size", [(256, 256), (720, 576), (1920, 1080)])
+def test_visualizations_match_public_overlays(size):
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+    mask = np.zeros((256, 256), dtype=np.uint8)
+    mask[80:170, 60:200] = 1
+    
+    overlay, gradcam = create_visualizations(image, mask, gradcam_alpha=0.4)
+    
+    assert np.array_equal(np.asarray(overlay), np.asarray(create_overlay(image, mask)))
+    assert np.array_equal(np.asarray(gradcam), np.asarray(create_gradcam_overlay(image, mask, alpha=0.4)))
@@ -0,0 +1,70 @@
+"""
+Decode and resize the Kvasir-SEG dataset once into a single uint8 tensor file,
+so training reads memory-mapped tensors instead of decoding JPEGs every epoch.
+The cache records the (image, mask) file names and the newest file mtime it was
+built from; train.py rebuilds it when those no longer match the dataset on disk.
+
+Usage (from CRC_model/):
+    python -m training.cache_dataset --root data/kvasir_seg --img-size 256
+"""
+
+import argparse
+import os
+import torch
+
+from data.dataset import KvasirSegDataset
+from utils.transforms import get_uint8_transforms
+
+
+def cache_path_for(root_dir, img_size):
+    return os.path.join(root_dir, f"kvasir_cache_{img_size}.pt")
+
+
+def source_fingerprint(dataset):
+    """Sorted (image, mask) file names of a KvasirSegDataset and the newest mtime among them."""
+    mtime_ns = max(
+        (
+            os.stat(os.path.join(directory, name)).st_mtime_ns
+            for image_name, mask_name in dataset.samples
+            for directory, name in ((dataset.image_dir, image_name), (dataset.mask_dir, mask_name))
+        ),
+        default=0,
+    )
+    return {"samples": list(dataset.samples), "mtime_ns": mtime_ns}
+
+
+def cache_is_current(cache_path, dataset):
+    """True if the cache was built from exactly the files (and file versions) of `dataset`."""
+    try:
+        source = torch.load(cache_path, mmap=True).get("source")
+    except TypeError:  # PyTorch < 2.1 has no mmap loading
+        source = torch.load(cache_path).get("source")
+    # Caches from before the fingerprint was stored have no "source" and count as stale
+    return source == source_fingerprint(dataset)
+
+
+def build_cache(root_dir, img_size=256):
+    transform_img, transform_mask = get_uint8_transforms(img_size)
+    dataset = KvasirSegDataset(root_dir, transform_img, transform_mask)
+
+    images = torch.empty((len(dataset), 3, img_size, img_size), dtype=torch.uint8)
+    masks = torch.empty((len(dataset), 1, img_size, img_size), dtype=torch.uint8)
+    for i in range(len(dataset)):
+        image, mask = dataset[i]
+        images[i] = image
+        # ToTensor scaled the mask by 1/255, so this round trip is exact
+        masks[i] = (mask * 255).round_().to(torch.uint8)
+
+    cache_path = cache_path_for(root_dir, img_size)
+    torch.save({"images": images, "masks": masks, "source": source_fingerprint(dataset)}, cache_path)
+    print(f"✅ Cached {len(dataset)} samples to {cache_path}")
+    return cache_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache the Kvasir-SEG dataset as uint8 tensors")
+    parser.add_argument("--root", default="data/kvasir_seg")
+    parser.add_argument("--img-size", type=int, default=256)
+    args = parser.parse_args()
+
+    build_cache(args.root, args.img_size)
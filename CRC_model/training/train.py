@@ -1,52 +1,84 @@
 import os
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, random_split
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
 from torch.optim import Adam
 from torch.optim.lr_scheduler import ReduceLROnPlateau
 
-from data.dataset import KvasirSegDataset
-from utils.transforms import get_transforms
+from data.dataset import KvasirSegDataset, CachedKvasirDataset, split_indices
+from training.cache_dataset import build_cache, cache_is_current, cache_path_for
+from utils.transforms import get_uint8_transforms, DeviceNormalize
 from model.unet_effnet import UNetEffNet
 
 
 # ----------------------------
-# 1. Dice Loss (for segmentation)
+# 1. BCE + Dice Loss (for segmentation)
 # ----------------------------
-class DiceLoss(nn.Module):
+class BCEDiceLoss(nn.Module):
     def __init__(self, smooth=1e-6):
-        super(DiceLoss, self).__init__()
+        super(BCEDiceLoss, self).__init__()
         self.smooth = smooth
 
-    def forward(self, y_pred, y_true):
-        y_pred = y_pred.view(-1)
-        y_true = y_true.view(-1)
+    def forward(self, logits, y_true):
+        # (B, H*W): one reduction per sample, so Dice weighs every image equally
+        logits = logits.flatten(1)
+        y_true = y_true.flatten(1)
 
-        intersection = (y_pred * y_true).sum()
-        dice = (2. * intersection + self.smooth) / (y_pred.sum() + y_true.sum() + self.smooth)
-        return 1 - dice
+        # Fused, numerically stable sigmoid + log (no log(0)); Dice still sees probabilities
+        bce = F.binary_cross_entropy_with_logits(logits, y_true)
+        y_pred = torch.sigmoid(logits)
+
+        intersection = (y_pred * y_true).sum(1)
+        dice = (2. * intersection + self.smooth) / (y_pred.sum(1) + y_true.sum(1) + self.smooth)
+        return bce + (1 - dice).mean()
+
+
+def amp_settings(device):
+    # Half-precision forward on GPU (bfloat16 on Ampere+); CPU stays FP32
+    use_amp = device.type == "cuda"
+    amp_dtype = torch.bfloat16 if use_amp and torch.cuda.is_bf16_supported() else torch.float16
+    return use_amp, amp_dtype
 
 
 # ----------------------------
 # 2. Training function
 # ----------------------------
-def train_one_epoch(model, dataloader, optimizer, criterion, device):
+def train_one_epoch(model, dataloader, optimizer, criterion, device, scaler=None, grad_accum_steps=1):
     model.train()
-    running_loss = 0.0
+    # Accumulate on the device; one .item() per epoch instead of a sync per batch
+    running_loss = torch.zeros((), device=device)
+    num_batches = 0
+
+    use_amp, amp_dtype = amp_settings(device)
+    if scaler is None:
+        scaler = torch.amp.GradScaler("cuda", enabled=False)
 
-    for images, masks in dataloader:
-        images, masks = images.to(device), masks.to(device)
+    # set_to_none skips zero-filling every .grad; backward allocates them fresh
+    optimizer.zero_grad(set_to_none=True)
+    total_steps = len(dataloader)
 
-        optimizer.zero_grad()
-        outputs = model(images)
+    for step, (images, masks) in enumerate(dataloader, 1):
+        images = images.to(device, memory_format=torch.channels_last, non_blocking=True)
+        masks = masks.to(device, non_blocking=True)
 
-        loss = criterion(outputs, masks)
-        loss.backward()
-        optimizer.step()
+        with torch.autocast(device_type=device.type, dtype=amp_dtype, enabled=use_amp):
+            outputs = model(images)
+
+        # The loss is computed in FP32 outside the autocast region
+        loss = criterion(outputs.float(), masks)
 
-        running_loss += loss.item()
+        # Gradients accumulate over grad_accum_steps batches (effective batch = batch_size * steps)
+        scaler.scale(loss / grad_accum_steps).backward()
+        if step % grad_accum_steps == 0 or step == total_steps:
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad(set_to_none=True)
 
-    return running_loss / len(dataloader)
+        running_loss += loss.detach()
+        num_batches += 1
+
+    return (running_loss / max(num_batches, 1)).item()
 
 
 # ----------------------------
@@ -54,24 +86,37 @@ def train_one_epoch(model, dataloader, optimizer, criterion, device):
 # ----------------------------
 def validate(model, dataloader, criterion, device):
     model.eval()
-    val_loss = 0.0
-    dice_score = 0.0
+    # Accumulate on the device; one .item() per epoch instead of two syncs per batch
+    val_loss = torch.zeros((), device=device)
+    dice_score = torch.zeros((), device=device)
+    num_batches = 0
+    num_samples = 0
+
+    use_amp, amp_dtype = amp_settings(device)
 
-    with torch.no_grad():
+    with torch.inference_mode():
         for images, masks in dataloader:
-            images, masks = images.to(device), masks.to(device)
+            images = images.to(device, memory_format=torch.channels_last, non_blocking=True)
+            masks = masks.to(device, non_blocking=True)
 
-            outputs = model(images)
+            with torch.autocast(device_type=device.type, dtype=amp_dtype, enabled=use_amp):
+                outputs = model(images)
+            # Score in FP32
+            outputs = outputs.float()
             loss = criterion(outputs, masks)
-            val_loss += loss.item()
+            val_loss += loss
 
-            # Compute Dice score
-            preds = (outputs > 0.5).float()
-            intersection = (preds * masks).sum()
-            dice = (2. * intersection) / (preds.sum() + masks.sum() + 1e-6)
-            dice_score += dice.item()
+            # Compute per-sample Dice (bool predictions, no float copy of the thresholded mask);
+            # outputs are logits, so p > 0.5 is logit > 0
+            preds = (outputs > 0).flatten(1)
+            targets = masks.flatten(1)
+            intersection = (preds * targets).sum(1)
+            dice = (2. * intersection) / (preds.sum(1) + targets.sum(1) + 1e-6)
+            dice_score += dice.sum()
+            num_batches += 1
+            num_samples += dice.numel()
 
-    return val_loss / len(dataloader), dice_score / len(dataloader)
+    return (val_loss / max(num_batches, 1)).item(), (dice_score / max(num_samples, 1)).item()
 
 
 # ----------------------------
@@ -85,41 +130,84 @@ def main():
     lr = 1e-4
     num_epochs = 20
     val_split = 0.2
+    grad_accum_steps = 1  # raise to train at a larger effective batch than fits in memory
 
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-    # Transforms
-    transform_img, transform_mask = get_transforms(img_size)
-
-    # Dataset
-    dataset = KvasirSegDataset(root_dir, transform_img, transform_mask)
-
-    # Train/validation split
-    val_size = int(len(dataset) * val_split)
-    train_size = len(dataset) - val_size
-    train_dataset, val_dataset = random_split(dataset, [train_size, val_size])
-
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
-
-    # Model
-    model = UNetEffNet(backbone_name="efficientnet_b0", num_classes=1).to(device)
-
-    # Loss = BCE + Dice
-    bce = nn.BCELoss()
-    dice = DiceLoss()
-    criterion = lambda y_pred, y_true: bce(y_pred, y_true) + dice(y_pred, y_true)
+    # TF32 matmuls/convolutions and cuDNN autotuning. benchmark picks the fastest conv
+    # algorithm per input shape and reuses it, which only pays off because shapes are
+    # fixed (img_size, batch_size, drop_last); turn it off if shapes vary per step.
+    # Keep Inductor's compile cache across runs so later starts skip most of the compilation
+    torch.set_float32_matmul_precision("high")
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cudnn.deterministic = False
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.abspath(".inductor_cache"))
+
+    # Transforms (resize only on the CPU; normalization runs on the device inside the model)
+    transform_img, transform_mask = get_uint8_transforms(img_size)
+
+    # Dataset (memory-mapped uint8 cache when training/cache_dataset.py has been run); a cache
+    # built from a different set or version of the image/mask files is rebuilt first
+    source_dataset = KvasirSegDataset(root_dir)
+    cache_path = cache_path_for(root_dir, img_size)
+    if os.path.exists(cache_path) and not cache_is_current(cache_path, source_dataset):
+        print(f"⚠️  {cache_path} does not match the files in {root_dir}; rebuilding it")
+        build_cache(root_dir, img_size)
+    # Train/validation split: each dataset owns its (seeded) index array, no Subset wrapper
+    train_idx, val_idx = split_indices(len(source_dataset), val_split)
+    if os.path.exists(cache_path):
+        train_dataset = CachedKvasirDataset(cache_path, indices=train_idx)
+        val_dataset = CachedKvasirDataset(cache_path, indices=val_idx)
+    else:
+        train_dataset = KvasirSegDataset(root_dir, transform_img, transform_mask, indices=train_idx)
+        val_dataset = KvasirSegDataset(root_dir, transform_img, transform_mask, indices=val_idx)
+
+    # Worker processes decode ahead of the GPU; pinned batches allow async H2D copies
+    loader_kwargs = dict(
+        num_workers=min(8, os.cpu_count() or 1),
+        pin_memory=device.type == "cuda",
+        persistent_workers=True,
+        prefetch_factor=4,
+    )
+    # drop_last keeps every training batch the same shape for the captured CUDA graph
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, drop_last=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, **loader_kwargs)
+
+    # Model (channels_last lets cuDNN / oneDNN use their NHWC convolution kernels); it outputs
+    # logits for BCEDiceLoss, so checkpoints load into a default (sigmoid) UNetEffNet for export
+    model = UNetEffNet(backbone_name="efficientnet_b0", num_classes=1, apply_sigmoid=False).to(
+        device, memory_format=torch.channels_last
+    )
+
+    # Compile the forward/backward graphs on PyTorch 2.x (fused Inductor kernels replayed as
+    # CUDA graphs, static shapes); checkpoints are still saved from `model`
+    normalized_model = nn.Sequential(DeviceNormalize(), model).to(device)
+    if hasattr(torch, "compile"):
+        compiled_model = torch.compile(normalized_model, mode="reduce-overhead", fullgraph=False, dynamic=False)
+    else:
+        compiled_model = normalized_model
+
+    # Loss = BCE + Dice, compiled so Inductor fuses both reductions over the mask
+    criterion = BCEDiceLoss()
+    if hasattr(torch, "compile"):
+        criterion = torch.compile(criterion)
 
     optimizer = Adam(model.parameters(), lr=lr)
     scheduler = ReduceLROnPlateau(optimizer, mode="min", patience=3, factor=0.5)
 
+    # Loss scaling keeps FP16 gradients from underflowing (bfloat16 has FP32's range and skips it)
+    use_amp, amp_dtype = amp_settings(device)
+    scaler = torch.amp.GradScaler("cuda", enabled=use_amp and amp_dtype == torch.float16)
+
     # Training loop
     best_val_dice = 0.0
     save_path = "best_model.pth"
 
     for epoch in range(num_epochs):
-        train_loss = train_one_epoch(model, train_loader, optimizer, criterion, device)
-        val_loss, val_dice = validate(model, val_loader, criterion, device)
+        train_loss = train_one_epoch(compiled_model, train_loader, optimizer, criterion, device, scaler, grad_accum_steps)
+        val_loss, val_dice = validate(compiled_model, val_loader, criterion, device)
 
         scheduler.step(val_loss)
 
@@ -18,7 +18,6 @@ export interface SegmentationResult {
   original?: string;
   overlay?: string;
   gradcam?: string;  // Grad-CAM heatmap from backend
-  mask?: string;
   error?: string;
   image_shape?: [number, number];
   mask_shape?: [number, number];